@@ -3,6 +3,7 @@ from zope.i18n import translate
 
 TEMPLATE = """\
 var delete_confirm_message = "%(delete_confirm_message)s";
+var queued_transition_timeout_message = "%(queued_transition_timeout_message)s";
 """
 
 
@@ -15,7 +16,13 @@ class JSVariables(BrowserView):
         delete_confirm_message = translate('delete_confirm_message',
                                            domain='imio.actionspanel',
                                            context=self.request)
+        queued_transition_timeout_message = translate(
+            'queued_transition_timeout_message',
+            domain='imio.actionspanel',
+            context=self.request,
+            default=u'The transition is still queued, the state of the element will change later.')
 
         return TEMPLATE % dict(
             delete_confirm_message=delete_confirm_message,
+            queued_transition_timeout_message=queued_transition_timeout_message,
         )
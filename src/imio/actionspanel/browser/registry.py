@@ -22,6 +22,17 @@ class IImioActionsPanelConfig(Interface):
         )
     )
 
+    queued_transitions = schema.List(
+        title=_(u'Queued transitions'),
+        description=_(u'Transitions that are not triggered immediately but queued and triggered later '
+                      u'by the @@process_queued_transitions view'),
+        required=False,
+        value_type=schema.BytesLine(
+            title=_("Queued transition value"),
+            description=_('Formatted like "portal_type" "." "transition name", like "Document.publish"'),
+        )
+    )
+
     @invariant
     def validateSettings(data):
         uniques = []
@@ -39,11 +39,46 @@ $("input.trigger-transition-prevent-default").click(function(event){
 }
 jQuery(document).ready(preventDefaultClickTransition);
 
+// find the actions panel containing tag if it may be refreshed alone,
+// if tag is not in a panel, look for the panel of the element with given uid
+function getRefreshableActionsPanel(tag, uid) {
+  var panel = $(tag).closest('table.actionspanel-no-style-table');
+  if (!panel.length && uid) {
+    panel = $('#faceted-form table.actionspanel-no-style-table[data-uid="' + uid + '"]').first();
+  }
+  if (panel.length && panel.attr('data-options') && $('#faceted-form').has(panel).length) {
+    return panel;
+  }
+  return null;
+}
+
+// patch the faceted row containing panel with the result of a partial refresh
+function refreshActionsPanel(panel, result) {
+  if (result.removed) {
+    var row = panel.closest('tr');
+    if (row.length) {
+      row.remove();
+    }
+    else {
+      Faceted.URLHandler.hash_changed();
+    }
+  }
+  else if (result.html) {
+    panel.replaceWith(result.html);
+    initializeOverlays();
+    preventDefaultClickTransition();
+  }
+}
+
 function triggerTransition(baseUrl, viewName, transition, tag) {
   // find comment in the page
   comment = '';
+  uid = null;
   if ($('form#confirmTransitionForm textarea').length) {
       comment = $('form#confirmTransitionForm textarea')[0].value;
+      // the button that opened the overlay may not be found, the panel
+      // of the element is then found using its uid
+      uid = $('form#confirmTransitionForm').attr('data-uid');
       // find the right tag because we are in an overlay and the tag will
       // never be found like being in a faceted
       // find the button that opened this overlay
@@ -51,25 +86,49 @@ function triggerTransition(baseUrl, viewName, transition, tag) {
       tag = $('[rel="#' + overlay_id + '"]');
   }
 
+  // in a faceted, only refresh the panel of the element if possible
+  var panel = getRefreshableActionsPanel(tag, uid);
+
   // refresh faceted if we are on it, else, let triggerTransition manage redirect
   redirect = '0'
-  if (!$('#faceted-form').has(tag).length) {
+  if (!panel && !$('#faceted-form').has(tag).length) {
     redirect = '1'
   }
+  var data = {'transition': transition,
+              'comment': comment,
+              'form.submitted': '1',
+              'redirect': redirect};
+  if (panel) {
+    data['refresh_panel'] = '1';
+    data['actionspanel_view_name'] = panel.attr('data-viewname');
+    data['options'] = panel.attr('data-options');
+    // the panel is rendered by this request, give it the page it is displayed in
+    data['actionspanel_return_to'] = panel.attr('data-return-to');
+    data['actionspanel_faceted'] = panel.attr('data-faceted');
+  }
 
   $.ajax({
     url: baseUrl + "/" + viewName,
     dataType: 'html',
-    data: {'transition': transition,
-           'comment': comment,
-           'form.submitted': '1',
-           'redirect': redirect},
+    data: data,
     cache: false,
     async: true,
     type: "POST",
     success: function(data) {
+        // the transition was queued, wait for it to be triggered
+        if (data && data.charAt(0) === '{' && 'job_id' in $.parseJSON(data)) {
+            waitForQueuedTransition($.parseJSON(data), redirect);
+        }
         // reload the faceted page if we are on it, refresh current if not
-        if ((redirect === '0') && !(data)) {
+        else if (panel) {
+            refreshActionsPanel(panel, $.parseJSON(data));
+            $.event.trigger({
+                type: "ap_transition_triggered",
+                tag: tag,
+                transition: transition,
+                comment: comment});
+        }
+        else if ((redirect === '0') && !(data)) {
             Faceted.URLHandler.hash_changed();
             $.event.trigger({
                 type: "ap_transition_triggered",
@@ -88,21 +147,63 @@ function triggerTransition(baseUrl, viewName, transition, tag) {
     });
 }
 
+// poll the status of a queued transition until it is triggered then refresh the page,
+// stop polling after QUEUED_TRANSITION_MAX_POLLS attempts as the job may never be processed
+var QUEUED_TRANSITION_MAX_POLLS = 30;
+function waitForQueuedTransition(job, redirect, polls) {
+  polls = polls || 0;
+  if (!job.job_id) {
+    alert(job.message);
+    return;
+  }
+  $.ajax({
+    url: portal_url + "/@@queued_transition_status",
+    dataType: 'json',
+    data: {'job_id': job.job_id},
+    cache: false,
+    async: true,
+    success: function(status) {
+      if (status.status === 'queued') {
+        if (polls < QUEUED_TRANSITION_MAX_POLLS) {
+          setTimeout(function() {waitForQueuedTransition(job, redirect, polls + 1);}, 2000);
+          return;
+        }
+        alert(queued_transition_timeout_message);
+      }
+      if (status.status === 'error') {
+        alert(status.message);
+      }
+      if (redirect === '0') {
+        Faceted.URLHandler.hash_changed();
+      }
+      else {
+        window.location.href = window.location.href;
+      }
+    }
+  });
+}
+
 function deleteElement(baseUrl, object_uid, tag) {
   redirect = '0';
   if (!$('#faceted-form').has(tag).length) {
     redirect = '1';
   }
+  // in a faceted, only remove the row of the element if possible
+  var panel = getRefreshableActionsPanel(tag);
   $.ajax({
     url: baseUrl + "/@@delete_givenuid",
     dataType: 'html',
     data: {'object_uid': object_uid,
-           'redirect': redirect},
+           'redirect': redirect,
+           'refresh_panel': panel ? '1' : '0'},
     cache: false,
     async: true,
     success: function(data) {
         // reload the faceted page if we are on it, refresh current if not
-        if ((redirect === '0') && !(data)) {
+        if (panel) {
+            refreshActionsPanel(panel, $.parseJSON(data));
+        }
+        else if ((redirect === '0') && !(data)) {
             Faceted.URLHandler.hash_changed();
         }
         else {
@@ -121,4 +222,128 @@ function deleteElement(baseUrl, object_uid, tag) {
       window.location.href = window.location.href;
       }
     });
-}
\ No newline at end of file
+}
+
+// trigger a transition on several elements at once, faceted is refreshed only once at the end
+function triggerTransitionForUIDs(baseUrl, uids, transition, tag) {
+  $.ajax({
+    url: baseUrl + "/@@batch_triggertransition",
+    dataType: 'json',
+    data: {'uids:list': uids,
+           'transition': transition},
+    traditional: true,
+    cache: false,
+    async: true,
+    type: "POST",
+    success: function(data) {
+        // reload the faceted page if we are on it, refresh current if not
+        if ($('#faceted-form').has(tag).length) {
+            Faceted.URLHandler.hash_changed();
+            $.event.trigger({
+                type: "ap_batch_transition_triggered",
+                tag: tag,
+                transition: transition,
+                results: data});
+        }
+        else {
+            window.location.href = window.location.href;
+        }
+      },
+    error: function(jqXHR, textStatus, errorThrown) {
+      /*console.log(textStatus);*/
+      window.location.href = window.location.href;
+      }
+    });
+}
+
+// delete several elements at once, faceted is refreshed only once at the end
+function deleteElements(baseUrl, uids, tag) {
+  $.ajax({
+    url: baseUrl + "/@@delete_givenuids",
+    dataType: 'json',
+    data: {'uids:list': uids},
+    traditional: true,
+    cache: false,
+    async: true,
+    type: "POST",
+    success: function(data) {
+        // reload the faceted page if we are on it, refresh current if not
+        if ($('#faceted-form').has(tag).length) {
+            Faceted.URLHandler.hash_changed();
+        }
+        else {
+            window.location.href = window.location.href;
+        }
+      },
+    error: function(jqXHR, textStatus, errorThrown) {
+      /*console.log(textStatus);*/
+      window.location.href = window.location.href;
+      }
+    });
+}
+
+// lazy loading of actions panels, panels of visible placeholders are loaded by batch
+function isActionsPanelPlaceholderVisible(placeholder) {
+  var rect = placeholder.getBoundingClientRect();
+  return rect.bottom >= 0 && rect.top <= (window.innerHeight || document.documentElement.clientHeight);
+}
+
+loadLazyActionsPanels = function() {
+  // group visible placeholders by view name and options
+  var batches = {};
+  $('div.actionspanel-lazy:not(.actionspanel-lazy-loading)').each(function() {
+    if (!isActionsPanelPlaceholderVisible(this)) {
+      return;
+    }
+    var $placeholder = $(this);
+    $placeholder.addClass('actionspanel-lazy-loading');
+    var key = $placeholder.attr('data-viewname') + '|' + $placeholder.attr('data-options') + '|' +
+              $placeholder.attr('data-return-to') + '|' + $placeholder.attr('data-faceted');
+    if (!(key in batches)) {
+      batches[key] = {'view_name': $placeholder.attr('data-viewname'),
+                      'options': $placeholder.attr('data-options'),
+                      'return_to': $placeholder.attr('data-return-to'),
+                      'faceted': $placeholder.attr('data-faceted'),
+                      'uids': []};
+    }
+    batches[key].uids.push($placeholder.attr('data-uid'));
+  });
+  $.each(batches, function(key, batch) {
+    $.ajax({
+      url: portal_url + "/@@actions_panel_batch",
+      dataType: 'json',
+      data: {'uids:list': batch.uids,
+             'actionspanel_view_name': batch.view_name,
+             'options': batch.options,
+             'actionspanel_return_to': batch.return_to,
+             'actionspanel_faceted': batch.faceted},
+      traditional: true,
+      cache: false,
+      async: true,
+      type: "POST",
+      success: function(data) {
+        $.each(data, function(uid, html) {
+          $('div.actionspanel-lazy-loading[data-uid="' + uid + '"]').replaceWith(html);
+        });
+        initializeOverlays();
+        preventDefaultClickTransition();
+      },
+      error: function(jqXHR, textStatus, errorThrown) {
+        /*console.log(textStatus);*/
+        $('div.actionspanel-lazy-loading').removeClass('actionspanel-lazy-loading');
+      }
+    });
+  });
+};
+
+jQuery(document).ready(function($) {
+  loadLazyActionsPanels();
+  var lazyTimer = null;
+  $(window).bind('scroll resize', function() {
+    clearTimeout(lazyTimer);
+    lazyTimer = setTimeout(loadLazyActionsPanels, 100);
+  });
+  if (typeof Faceted !== 'undefined') {
+    $(Faceted.Events).bind(Faceted.Events.AJAX_QUERY_SUCCESS, loadLazyActionsPanels);
+  }
+});
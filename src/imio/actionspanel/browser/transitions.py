@@ -1,7 +1,24 @@
+import json
+import logging
+logger = logging.getLogger('imio.actionspanel')
+
+import transaction
+from ZODB.POSException import ConflictError
+
+from zope.component import getMultiAdapter
+from zope.i18n import translate
+
+from plone import api
 from plone.memoize.instance import memoize
 
+from Products.CMFCore.WorkflowCore import WorkflowException
 from Products.Five.browser import BrowserView
 
+from imio.actionspanel import ActionsPanelMessageFactory as _
+from imio.actionspanel import queued_transitions
+from imio.actionspanel import stats
+from imio.actionspanel.browser.views import parsePanelOptions
+
 
 class ConfirmTransitionView(BrowserView):
     '''
@@ -21,35 +38,203 @@ class ConfirmTransitionView(BrowserView):
         # the confirmation popup
         submitted = form.get('form.buttons.save', False) or form.get('form.submitted') == '1'
         cancelled = form.get('form.buttons.cancel', False)
-        actionspanel_view = self.context.restrictedTraverse('@@%s' % self.actionspanel_view_name)
+        actionspanel_view = self.actionspanel_view()
         if cancelled:
             # the only way to enter here is the popup overlay not to be shown
             # because while using the popup overlay, the jQ function take care of hidding it
             # while the Cancel button is hit
             self.request.response.redirect(actionspanel_view._gotoReferer())
         elif submitted:
+            if actionspanel_view.isQueuedTransition(self.request.get('transition')):
+                return self._queueTransition()
+            if form.get('refresh_panel') == '1':
+                return self._triggerTransitionAndRefreshPanel(actionspanel_view)
             return actionspanel_view.triggerTransition(transition=self.request.get('transition'),
                                                        comment=self.request.get('comment'),
                                                        redirect=bool(self.request.get('redirect') == '1'))
         return self.index()
 
+    def _triggerTransitionAndRefreshPanel(self, actionspanel_view):
+        '''
+          Trigger the transition and return a JSON dict with the panel of the context
+          rendered again so only this panel is refreshed in the faceted navigation.
+          If the context is not viewable anymore, it is marked as 'removed'.
+          The URL of the page displaying the panel and the faceted flag are given
+          by actionspanel.js in the request so the panel is rendered like in this page.
+        '''
+        redirectTo = actionspanel_view.triggerTransition(transition=self.request.get('transition'),
+                                                         comment=self.request.get('comment'),
+                                                         redirect=False)
+        res = {'uid': self.context.UID(), 'removed': bool(redirectTo), 'html': ''}
+        if not redirectTo:
+            # use a new view as the state of the context changed
+            view = getMultiAdapter((self.context, self.request), name=self.actionspanel_view_name)
+            res['html'] = view(**parsePanelOptions(self.request.form.get('options')))
+        self.request.response.setHeader('content-type', 'application/json')
+        return json.dumps(res)
+
+    def _queueTransition(self):
+        '''
+          Queue the transition so it is triggered later by @@process_queued_transitions.
+          When called by actionspanel.js, a JSON dict with the job id is returned so the
+          job status may be polled, else the user is redirected to the HTTP_REFERER.
+        '''
+        plone_utils = api.portal.get_tool('plone_utils')
+        transition = self._transition()
+        res = {'uid': self.context.UID(), 'job_id': None, 'status': queued_transitions.ERROR}
+        if not transition or not transition['may_trigger']:
+            msg = _('transition_not_queued',
+                    default=u'This transition can not be triggered on this element.')
+        else:
+            res['job_id'] = queued_transitions.queueTransition(self.context,
+                                                               transition['id'],
+                                                               self.request.get('comment', ''))
+            res['status'] = queued_transitions.QUEUED
+            msg = _('transition_queued',
+                    default=u'The transition was queued, the state of the element will change in a few moments.')
+        if self.request.get_header('X-Requested-With') != 'XMLHttpRequest':
+            plone_utils.addPortalMessage(msg, type=res['job_id'] and 'info' or 'warning')
+            return self.request.get('HTTP_REFERER')
+        res['message'] = translate(msg, context=self.request)
+        self.request.response.setHeader('content-type', 'application/json')
+        return json.dumps(res)
+
+    @memoize
+    def actionspanel_view(self):
+        '''The actions panel view, shared by every methods of this view.'''
+        return self.context.restrictedTraverse('@@%s' % self.actionspanel_view_name)
+
+    @memoize
+    def _transition(self):
+        '''Informations about the requested transition, only this transition guard is evaluated.'''
+        return self.actionspanel_view().getTransition(self.request.get('transition'))
+
     @memoize
     def initTransition(self):
         '''Initialize values for the 'transition' form field.'''
         res = {}
-        actionspanel_view = self.context.restrictedTraverse('@@%s' % self.actionspanel_view_name)
-        availableTransitions = actionspanel_view.getTransitions()
-        for availableTransition in availableTransitions:
-            if self.request.get('transition') == availableTransition['id'] and \
-               availableTransition['confirm'] is True:
-                res['id'] = self.request.get('transition')
-                res['confirm'] = False
+        transition = self._transition()
+        if transition and transition['confirm'] is True:
+            res['id'] = transition['id']
+            res['confirm'] = False
         return res
 
     def transition_title(self):
         '''Returns transition title.'''
-        actionspanel_view = self.context.restrictedTraverse('@@%s' % self.actionspanel_view_name)
-        availableTransitions = actionspanel_view.getTransitions()
-        for availableTransition in availableTransitions:
-            if self.request.get('transition') == availableTransition['id']:
-                return availableTransition['title']
+        transition = self._transition()
+        if transition:
+            return transition['title']
+
+
+class BatchTriggerTransitionView(BrowserView):
+    '''
+      Trigger a transition on several elements at once.
+      Callable using classic traverse in a url :
+      http://nohost/plonesite/@@batch_triggertransition?uids:list=UID1&uids:list=UID2&transition=publish
+      Elements are get using one single catalog query and the transition is triggered on
+      every element in the same transaction, an element for which the transition could not be
+      triggered does not prevent the transition to be triggered on other elements.
+      Transitions defined as queued in the registry are queued for every element instead.
+      Returns a JSON dict with UID as key and a dict with 'status' ('ok', 'queued' or 'error')
+      and 'message' as value, queued elements also have the 'job_id' to poll.
+    '''
+
+    def __call__(self):
+        """ """
+        stats.recordRetry(self.request, 'batch_triggertransition')
+        form = self.request.form
+        uids = form.get('uids', [])
+        if isinstance(uids, basestring):
+            uids = [uids]
+        transition = form.get('transition')
+        comment = form.get('comment', '')
+        not_found = translate(_('batch_transition_element_not_found',
+                                default=u'This element could not be found.'),
+                              context=self.request)
+        res = dict([(uid, {'status': 'error', 'message': not_found}) for uid in uids])
+        if uids:
+            brains = api.portal.get_tool('portal_catalog')(UID=uids)
+            for brain in brains:
+                res[brain.UID] = self._triggerTransition(brain, transition, comment)
+        done = len([uid for uid in res if res[uid]['status'] == 'ok'])
+        queued = len([uid for uid in res if res[uid]['status'] == queued_transitions.QUEUED])
+        failed = len(res) - done - queued
+        plone_utils = api.portal.get_tool('plone_utils')
+        if done or failed:
+            msg = _('batch_transition_done',
+                    default=u'The state of ${done} element(s) changed, ${failed} element(s) could not be changed.',
+                    mapping={'done': done, 'failed': failed})
+            plone_utils.addPortalMessage(msg, type=not failed and 'info' or 'warning')
+        if queued:
+            msg = _('batch_transition_queued',
+                    default=u'The transition was queued for ${queued} element(s), their state will change '
+                            u'in a few moments.',
+                    mapping={'queued': queued})
+            plone_utils.addPortalMessage(msg, type='info')
+        self.request.response.setHeader('content-type', 'application/json')
+        return json.dumps(res)
+
+    def _triggerTransition(self, brain, transition, comment):
+        """
+          Trigger p_transition on the element of p_brain, if it fails, changes made
+          are rolled back.  Returns the element outcome.
+        """
+        savepoint = transaction.savepoint(optimistic=True)
+        try:
+            obj = brain.getObject()
+            actionspanel_view = getMultiAdapter((obj, self.request), name='actions_panel')
+            if actionspanel_view.isQueuedTransition(transition):
+                return self._queueTransition(actionspanel_view, transition, comment)
+            api.portal.get_tool('portal_workflow').doActionFor(obj, transition, comment=comment)
+        except ConflictError:
+            raise
+        except WorkflowException, exc:
+            savepoint.rollback()
+            return {'status': 'error', 'message': translate(exc.message, context=self.request)}
+        except Exception, exc:
+            savepoint.rollback()
+            logger.exception('Error while triggering transition "{0}" on {1}'.format(transition, brain.UID))
+            return {'status': 'error', 'message': unicode(repr(exc))}
+        return {'status': 'ok', 'message': ''}
+
+    def _queueTransition(self, actionspanel_view, transition, comment):
+        """Queue p_transition on the context of p_actionspanel_view if it may be triggered."""
+        info = actionspanel_view.getTransition(transition)
+        if not info or not info['may_trigger']:
+            msg = _('transition_not_queued',
+                    default=u'This transition can not be triggered on this element.')
+            return {'status': 'error', 'message': translate(msg, context=self.request)}
+        job_id = queued_transitions.queueTransition(actionspanel_view.context, info['id'], comment)
+        return {'status': queued_transitions.QUEUED, 'message': u'', 'job_id': job_id}
+
+
+class ProcessQueuedTransitionsView(BrowserView):
+    '''
+      Trigger the queued transitions, this is supposed to be called by a clock server :
+      http://nohost/plonesite/@@process_queued_transitions
+    '''
+
+    def __call__(self):
+        """ """
+        return 'Processed {0} queued transition(s).'.format(
+            queued_transitions.processQueuedTransitions(self.request))
+
+
+class QueuedTransitionStatusView(BrowserView):
+    '''
+      Return the status of a queued transition as JSON, used by actionspanel.js to poll
+      the job until it is processed, only the user that queued the transition may get it.
+      Callable using classic traverse in a url :
+      http://nohost/plonesite/@@queued_transition_status?job_id=JOB_ID
+      Returns a JSON dict with 'uid', 'status' ('queued', 'done', 'error' or 'unknown') and 'message'.
+    '''
+
+    def __call__(self):
+        """ """
+        job_id = self.request.get('job_id')
+        job = queued_transitions.getJob(job_id)
+        res = {'job_id': job_id, 'uid': None, 'status': 'unknown', 'message': u''}
+        if job is not None and job['username'] == api.user.get_current().getUserName():
+            res.update({'uid': job['uid'], 'status': job['status'], 'message': job['message']})
+        self.request.response.setHeader('content-type', 'application/json')
+        return json.dumps(res)
@@ -1,42 +1,230 @@
+import json
 import logging
 logger = logging.getLogger('imio.actionspanel')
+import time
+from hashlib import md5
 from operator import itemgetter
+from xml.sax.saxutils import quoteattr
 
 from appy.gen import No
 
 from Acquisition import aq_base
+from App.config import getConfiguration
 from AccessControl import Unauthorized
 
 from zope.component import getAdapter, getUtility
 from zope.component import getMultiAdapter
+from zope.component import queryMultiAdapter
 from zope.i18n import translate
+from zope.i18nmessageid import Message
+from zope.ramcache.ram import RAMCache
 
 from plone import api
+from plone.memoize import ram
+from plone.memoize.instance import memoize
 from plone.registry.interfaces import IRegistry
 
 from Products.Five import BrowserView
 from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
+from Products.CMFCore.ActionInformation import ActionInfo
+from Products.CMFCore.interfaces import IAction
+from Products.CMFCore.interfaces import IActionProvider
 from Products.CMFCore.permissions import ManageProperties
+from Products.CMFCore.permissions import ModifyPortalContent
 from Products.CMFCore.utils import _checkPermission
 from Products.CMFCore.WorkflowCore import WorkflowException
 from Products.CMFPlone import PloneMessageFactory as _plone
 from Products.DCWorkflow.Expression import StateChangeInfo
 from Products.DCWorkflow.Expression import createExprContext
 from Products.DCWorkflow.Transitions import TRIGGER_USER_ACTION
+from Products.ZCatalog.interfaces import ICatalogBrain
 
 from imio.actionspanel import ActionsPanelMessageFactory as _
+from imio.actionspanel import stats
 from imio.actionspanel.interfaces import IContentDeletable
 from imio.actionspanel.utils import unrestrictedRemoveGivenObject
+from imio.actionspanel.utils import unrestrictedRemoveGivenObjects
 from imio.history.interfaces import IImioHistory
 
 
 DEFAULT_CONFIRM_VIEW = '@@triggertransition'
 
+LAZY_PLACEHOLDER = '<div class="actionspanel-lazy" data-uid={uid} ' \
+                   'data-viewname={view_name} data-options={options} ' \
+                   'data-return-to={return_to} data-faceted={faceted}></div>'
+
+
+# RAM cache used to store rendered panels when ActionsPanelView.CACHE_RENDERED_PANEL
+# is True, entries not accessed for maxAge seconds are removed and when there are more
+# than maxEntries entries, least accessed ones are removed, use PANEL_CACHE.update
+# to change these values
+PANEL_CACHE = RAMCache()
+PANEL_CACHE.update(maxEntries=5000, maxAge=3600, cleanupInterval=300)
+
+
+def panelCacheStatistics():
+    '''Return hits, misses and number of entries of the rendered panels cache.'''
+    res = {'hits': 0, 'misses': 0, 'entries': 0}
+    for cache_stats in PANEL_CACHE.getStatistics():
+        for key in res:
+            res[key] += cache_stats[key]
+    return res
+
+
+def _transition_descriptors_cachekey(method, self, workflow, state, confirmViews):
+    '''cachekey method for ActionsPanelView._transitionDescriptors.'''
+    # use the _p_mtime of the workflow definition elements so
+    # cache is invalidated when the workflow is changed
+    transitions = workflow.transitions
+    return ('/'.join(workflow.getPhysicalPath()),
+            state.getId(),
+            getattr(workflow, '_p_mtime', None),
+            getattr(state, '_p_mtime', None),
+            [getattr(transitions.get(transitionId, None), '_p_mtime', None)
+             for transitionId in state.transitions],
+            confirmViews,
+            self.request.get('LANGUAGE', ''))
+
+
+def _history_last_event_has_comments_cachekey(method, self):
+    '''cachekey method for ActionsPanelView.historyLastEventHasComments.'''
+    # the workflow_history changes when an event is added to it
+    history = getattr(aq_base(self.context), 'workflow_history', None) or {}
+    # comments shown in the history depend on the member and his roles
+    return (self.contextUID(),
+            [(workflowId, len(events), events and events[-1].get('time') or None)
+             for workflowId, events in sorted(history.items())],
+            self.member.getId(),
+            tuple(sorted(self.member.getRolesInContext(self.context))))
+
+
+def _translation_table_cachekey(method, msgid, domain, language, default, mapping):
+    '''cachekey method for translateForLanguage.'''
+    # in development mode, translation catalogs are reloaded when changed
+    if getConfiguration().debug_mode:
+        raise ram.DontCache
+    return (msgid, domain, language, default, mapping and sorted(mapping.items()))
+
+
+@ram.cache(_translation_table_cachekey)
+def translateForLanguage(msgid, domain, language, default, mapping):
+    '''Translation table of transition titles, type titles, ... by language.'''
+    return translate(msgid, domain=domain, mapping=mapping, target_language=language, default=default)
+
+
+def parsePanelOptions(value):
+    """
+      Parse the JSON dict p_value of parameters to pass to the actions panel view,
+      as sent by actionspanel.js, to a dict usable as keyword arguments.
+    """
+    return dict([(str(k), v) for k, v in json.loads(value or '{}').items()])
+
+
+def _transitions_to_confirm_cachekey(method, values):
+    '''cachekey method for parseTransitionsToConfirm.'''
+    return values
+
+
+@ram.cache(_transitions_to_confirm_cachekey)
+def parseTransitionsToConfirm(values):
+    """
+      Parse the transitions to confirm stored in the registry, p_values are lines
+      formatted like "type.transition|view", to a dict with "type.transition" as key
+      and the confirmation view as value, DEFAULT_CONFIRM_VIEW if no view is defined.
+      The returned dict is shared, it must not be changed.
+    """
+    res = {}
+    for val in values:
+        name, confirm_view = val.split('|')
+        res[name] = confirm_view or DEFAULT_CONFIRM_VIEW
+    return res
+
+
+class TransitionInfo(object):
+    """
+      Informations about a transition displayed for an element, used as a read-only mapping
+      by templates (transition/title, transition['confirm'], ...).  The static part (id, title,
+      confirmation view, ...) is the descriptor shared by every elements in the same state,
+      only may_trigger, reason, url and icon are stored for the element.
+      Use copy() to get a dict that may be changed.
+    """
+
+    __slots__ = ('descriptor', 'may_trigger', 'reason', 'url', 'icon')
+
+    # keys stored for the element, other keys are taken from the descriptor
+    OWN_KEYS = ('may_trigger', 'reason', 'url', 'icon')
+
+    # make informations available in page templates and restricted python
+    __allow_access_to_unprotected_subobjects__ = 1
+
+    def __init__(self, descriptor, may_trigger, url, icon, reason=None):
+        set_attribute = super(TransitionInfo, self).__setattr__
+        set_attribute('descriptor', descriptor)
+        set_attribute('may_trigger', may_trigger)
+        set_attribute('reason', reason)
+        set_attribute('url', url)
+        set_attribute('icon', icon)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TransitionInfo is read-only, use copy() to get a dict that may be changed')
+
+    def __getitem__(self, key):
+        if key in self.OWN_KEYS:
+            # 'reason' is only available if the transition may not be triggered
+            if key == 'reason' and self.may_trigger:
+                raise KeyError(key)
+            return getattr(self, key)
+        return self.descriptor[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def keys(self):
+        keys = [key for key in self.descriptor if key not in self.OWN_KEYS]
+        keys.extend([key for key in self.OWN_KEYS if key != 'reason' or not self.may_trigger])
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def copy(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return '<TransitionInfo %r>' % self.copy()
+
 
 class ActionsPanelView(BrowserView):
     """
       This manage the view displaying actions on context.
     """
+
+    # templates used to render the different sections, they are compiled once
+    # by process (and reloaded if changed on disk in debug mode), a subclass
+    # may override a section template by redefining the relevant attribute
+    transitions_template = ViewPageTemplateFile("actions_panel_transitions.pt")
+    edit_template = ViewPageTemplateFile("actions_panel_edit.pt")
+    own_delete_template = ViewPageTemplateFile("actions_panel_own_delete.pt")
+    arrows_template = ViewPageTemplateFile("actions_panel_arrows.pt")
+    actions_template = ViewPageTemplateFile("actions_panel_actions.pt")
+    add_content_template = ViewPageTemplateFile("actions_panel_add_content.pt")
+    history_template = ViewPageTemplateFile("actions_panel_history.pt")
+
     def __init__(self, context, request):
         super(ActionsPanelView, self).__init__(context, request)
         self.context = context
@@ -68,6 +256,22 @@ class ActionsPanelView(BrowserView):
         # if you define some here, only these actions will be kept
         self.ACCEPTABLE_ACTIONS = ()
 
+        # action providers (other than portal_actions) not to get object_buttons actions from
+        self.IGNORABLE_PROVIDERS = ('portal_workflow', )
+
+        # text of workflow guard expressions that do not depend on the element
+        # but only on the member and the workflow state, the result of these
+        # expressions is shared by every elements in the same state
+        self.CONTEXT_INDEPENDENT_GUARD_EXPRESSIONS = ()
+
+        # store rendered panel in PANEL_CACHE, only enable this if the panel only depends on
+        # the element review_state, modification date and member roles and groups
+        self.CACHE_RENDERED_PANEL = False
+
+        # catalog brain of the element when rendered by renderBatch, some informations
+        # are taken from it instead of the element (review_state, ...)
+        self.brain = None
+
     def __call__(self,
                  useIcons=True,
                  showTransitions=True,
@@ -80,11 +284,33 @@ class ActionsPanelView(BrowserView):
                  showHistoryLastEventHasComments=True,
                  showArrows=False,
                  arrowsPortalTypeAware=False,
+                 lazy=False,
+                 asData=False,
                  **kwargs):
         """
           Master method that will render the content.
           This is not supposed to be overrided.
+          If p_lazy is True, only a placeholder is rendered, the panel will be
+          loaded by actionspanel.js when it is visible, if parameters are not JSON
+          serializable, the panel is rendered immediately.
+          If p_asData is True, the data displayed by the panel is returned instead of HTML.
         """
+        # keep parameters used to render the panel so it may be rendered
+        # again the same way, by the lazy loading for example
+        self.options = dict(useIcons=useIcons,
+                            showTransitions=showTransitions,
+                            appendTypeNameToTransitionLabel=appendTypeNameToTransitionLabel,
+                            showEdit=showEdit,
+                            showOwnDelete=showOwnDelete,
+                            showActions=showActions,
+                            showAddContent=showAddContent,
+                            showHistory=showHistory,
+                            showHistoryLastEventHasComments=showHistoryLastEventHasComments,
+                            showArrows=showArrows,
+                            arrowsPortalTypeAware=arrowsPortalTypeAware,
+                            **kwargs)
+        if lazy and self.jsonOptions() is not None:
+            return self.renderLazy()
         self.useIcons = useIcons
         self.showTransitions = showTransitions
         self.appendTypeNameToTransitionLabel = appendTypeNameToTransitionLabel
@@ -105,10 +331,206 @@ class ActionsPanelView(BrowserView):
         self.arrowsPortalTypeAware = arrowsPortalTypeAware
         self.kwargs = kwargs
         self.hasActions = False
+        if asData:
+            return self.getPanelData()
+        if self.CACHE_RENDERED_PANEL:
+            return self._cachedIndex()
         return self.index()
 
+    def _cachedIndex(self):
+        """
+          Render the panel using PANEL_CACHE, the panel is rendered again if the element
+          review_state or modification date changed, for another member or for another page.
+        """
+        key = self._panelCacheKey()
+        if key is None:
+            return self.index()
+        cacheName = '{0}.{1}:{2}'.format(self.__class__.__module__, self.__class__.__name__, self.__name__)
+        res = PANEL_CACHE.query(cacheName, dict(key=key))
+        if res is None:
+            stats.increment(self.request, 'panel_cache_misses')
+            res = self.index()
+            PANEL_CACHE.set(res, cacheName, dict(key=key))
+        else:
+            stats.increment(self.request, 'panel_cache_hits')
+        return res
+
+    def _panelCacheKey(self):
+        """
+          Key used to store the rendered panel in PANEL_CACHE, None if the panel
+          can not be cached : arrows depend on sibling elements and options must be JSON serializable.
+        """
+        if self.showArrows or self.jsonOptions() is None:
+            return None
+        groups = self.request.get('imio.actionspanel_member_groups_cachekey', None)
+        if groups is None:
+            groups = tuple(sorted(self.member.getGroups()))
+            self.request.set('imio.actionspanel_member_groups_cachekey', groups)
+        if self.brain is not None:
+            review_state = self.brain.review_state
+        else:
+            wfTool = api.portal.get_tool('portal_workflow')
+            review_state = wfTool.getInfoFor(self.context, 'review_state', None)
+        key = (self.contextUID(),
+               str(self.context.modified()),
+               review_state,
+               self.context.portal_type,
+               json.dumps(self.options, sort_keys=True),
+               self.request.get('LANGUAGE', ''),
+               # urls are absolute and may depend on virtual hosting
+               self.portal_url,
+               # the panel contains the URL of the page and the faceted flag
+               self._returnTo(),
+               self.isInFacetedNavigation(),
+               # the history icon depends on the member
+               self.member.getId(),
+               tuple(sorted(self.member.getRolesInContext(self.context))),
+               groups)
+        return md5(repr(key)).hexdigest()
+
+    def getPanelData(self):
+        """
+          Return the data displayed by the panel regarding the parameters given to the view,
+          as a dict that may be serialized to JSON so the panel may be rendered client side.
+        """
+        context_url = self.contextURL()
+        data = {'uid': self.contextUID(),
+                'url': context_url}
+        if self.showTransitions:
+            data['transitions'] = [
+                dict(transition, trigger_url=self.computeTriggerTransitionLink(transition))
+                for transition in self.getTransitions()]
+        if self.showEdit and self.useIcons and self.mayEdit():
+            data['edit'] = {'url': '{0}/{1}'.format(context_url, self.getEditAction())}
+        if self.showOwnDelete and IContentDeletable(self.context).mayDelete():
+            data['delete'] = {'url': '{0}/@@delete_givenuid?object_uid={1}'.format(context_url,
+                                                                                 data['uid'])}
+        if self.useIcons and self.showArrows and self.member.has_permission(ManageProperties, self.parent):
+            parentObjectIds = self._parentObjectIds()
+            objId = self.context.getId()
+            moveUrl = self._moveUrl()
+            data['arrows'] = {'is_first': objId == parentObjectIds[0],
+                              'is_last': objId == parentObjectIds[-1],
+                              'move_urls': dict([(position, moveUrl % (position, objId))
+                                                 for position in ('top', 'up', 'down', 'bottom')])}
+        if self.showActions:
+            data['actions'] = [
+                {'id': action['id'],
+                 'title': self._translate(action['title'], domain='plone'),
+                 'description': self._translate(action['description'], domain='plone'),
+                 'url': action['url'],
+                 'icon': action['icon'] and '{0}/{1}'.format(self.portal_url, action['icon'])}
+                for action in self.listObjectButtonsActions()]
+        if self.showAddContent:
+            data['add_content'] = [
+                {'id': addable['id'],
+                 'title': self._translate(addable['title']),
+                 'url': addable['action']}
+                for addable in self.addableContents()]
+        if self.showHistory and self.useIcons and self.showHistoryForContext():
+            data['history'] = {
+                'url': '{0}/@@historyview'.format(context_url),
+                'last_event_has_comments': bool(self.showHistoryLastEventHasComments and
+                                                self.historyLastEventHasComments())}
+        return data
+
+    def viewName(self):
+        """Name of the view, used to render the panel again the same way."""
+        return self.__name__
+
+    def jsonOptions(self):
+        """
+          Parameters used to render the panel as JSON, used to render the panel again
+          the same way, None if some parameters are not JSON serializable.
+        """
+        try:
+            return json.dumps(self.options)
+        except TypeError:
+            return None
+
+    def renderLazy(self):
+        """
+          Render a placeholder that actionspanel.js will replace by the panel,
+          panels of visible placeholders are loaded by batch using @@actions_panel_batch.
+          Parameters used to render the panel must be JSON serializable.
+          The URL to return to and the fact that we are in a faceted navigation are
+          kept in the placeholder so the panel is rendered like if it was rendered now.
+        """
+        return self._lazyPlaceholder(self.contextUID(), self.jsonOptions())
+
+    def _lazyPlaceholder(self, uid, options):
+        """Placeholder for the element with p_uid, p_options are the JSON parameters of the panel."""
+        return LAZY_PLACEHOLDER.format(uid=quoteattr(uid),
+                                       view_name=quoteattr(self.__name__),
+                                       options=quoteattr(options),
+                                       return_to=quoteattr(self._returnTo()),
+                                       faceted=quoteattr(self.isInFacetedNavigation() and '1' or '0'))
+
+    def renderBatch(self, objects, **kwargs):
+        """
+          Render the actions panel of every given p_objects, that may be objects
+          or catalog brains, this is useful to render the panel of every elements
+          of a listing at once.  Returns a dict with UID as key and rendered panel as value.
+          p_kwargs are passed to every rendered view, so the same parameters as when
+          calling the view on a single element may be used.
+          Elements are rendered using the same request so everything that is cached
+          on it (member, portal, workflows, ...) is computed only once.
+          When rendering brains, the brain is given to the view and, if p_lazy is True,
+          the placeholder is rendered without getting the object.
+        """
+        res = {}
+        lazyOptions = None
+        if kwargs.get('lazy'):
+            lazyOptions = dict(kwargs)
+            del lazyOptions['lazy']
+            try:
+                lazyOptions = json.dumps(lazyOptions)
+            except TypeError:
+                lazyOptions = None
+        for obj in objects:
+            brain = None
+            if ICatalogBrain.providedBy(obj):
+                uid = obj.UID
+                if lazyOptions is not None:
+                    res[uid] = self._lazyPlaceholder(uid, lazyOptions)
+                    continue
+                brain = obj
+                obj = brain.getObject()
+            else:
+                uid = obj.UID()
+            view = getMultiAdapter((obj, self.request), name=self.__name__)
+            view.brain = brain
+            res[uid] = view(**kwargs)
+        return res
+
+    @memoize
+    def contextURL(self):
+        """URL of the element, computed once by rendered panel, taken from the brain if available."""
+        if self.brain is not None:
+            return self.brain.getURL()
+        return self.context.absolute_url()
+
+    @memoize
+    def contextUID(self):
+        """UID of the element, computed once by rendered panel."""
+        if self.brain is not None:
+            return self.brain.UID
+        return self.context.UID()
+
+    @memoize
+    def parentURL(self):
+        """URL of the parent of the element, computed once by rendered panel."""
+        return self.parent.absolute_url()
+
     def isInFacetedNavigation(self):
-        """Is the actions panel displayed in a faceted navigation?"""
+        """
+          Is the actions panel displayed in a faceted navigation?
+          When the panel is rendered by another request than the one displaying it
+          (lazy loading, refresh after a transition), this is given in the request.
+        """
+        faceted = self.request.form.get('actionspanel_faceted', None)
+        if faceted is not None:
+            return faceted == '1'
         return bool(self.request['URL'].endswith('@@faceted_query'))
 
     def _renderSections(self):
@@ -116,10 +538,34 @@ class ActionsPanelView(BrowserView):
           This will check what sections need to be rendered.
           This is not supposed to be overrided.
         """
+        if stats.isEnabled():
+            return self._renderSectionsWithStats()
+
         res = ''
+        for section in self.SECTIONS_TO_RENDER:
+            renderedSection = getattr(self, section)() or ''
+            res += renderedSection
+        return res
 
+    def _renderSectionsWithStats(self):
+        """
+          Render sections like _renderSections and store rendering time of every section
+          by portal_type and review_state in the request statistics.
+        """
+        res = ''
+        if self.brain is not None:
+            review_state = self.brain.review_state
+        else:
+            wfTool = api.portal.get_tool('portal_workflow')
+            review_state = wfTool.getInfoFor(self.context, 'review_state', None)
         for section in self.SECTIONS_TO_RENDER:
+            start = time.time()
             renderedSection = getattr(self, section)() or ''
+            stats.addSectionTiming(self.request,
+                                   section,
+                                   self.context.portal_type,
+                                   review_state,
+                                   time.time() - start)
             res += renderedSection
         return res
 
@@ -131,25 +577,55 @@ class ActionsPanelView(BrowserView):
             return ''
 
         if self.showArrows and self.member.has_permission(ManageProperties, self.parent):
-            self.parentObjectIds = [
-                ob.id for ob in self.parent.objectValues()
-                if (not self.arrowsPortalTypeAware or ob.portal_type == self.context.portal_type)]
+            self.parentObjectIds = self._parentObjectIds()
             self.objId = self.context.getId()
             self.moveUrl = self._moveUrl()
-            return ViewPageTemplateFile("actions_panel_arrows.pt")(self)
+            return self.arrows_template()
         return ''
 
+    def _parentObjectIds(self):
+        """
+          Return ordered ids of the elements of the parent, only ids of elements of
+          same portal_type as context if arrowsPortalTypeAware.
+          Elements are not waked up and result is cached by request for the parent
+          so it is computed only once for every elements of a listing.
+        """
+        portal_type = self.arrowsPortalTypeAware and self.context.portal_type or ''
+        parent_path = '/'.join(self.parent.getPhysicalPath())
+        key = 'imio.actionspanel_parent_object_ids_%s_%s_cachekey' % (parent_path, portal_type)
+        ids = self.request.get(key, None)
+        if ids is None:
+            if not portal_type:
+                ids = self.parent.objectIds()
+            else:
+                # use the catalog to get elements of same portal_type
+                catalog = api.portal.get_tool('portal_catalog')
+                brains = catalog.unrestrictedSearchResults(path={'query': parent_path, 'depth': 1},
+                                                           portal_type=portal_type,
+                                                           sort_on='getObjPositionInParent')
+                ids = [brain.getId for brain in brains]
+            self.request.set(key, ids)
+        return ids or [self.context.getId()]
+
     def _moveUrl(self):
         """ """
         script_name = 'folder_position'
         if self.arrowsPortalTypeAware:
-            script_name = 'folder_position_typeaware'
+            script_name = '@@folder_position_typeaware'
 
         return "{0}/{1}?position=%s&id=%s&template_id={2}".format(
-            self.parent.absolute_url(), script_name, self._returnTo())
+            self.parentURL(), script_name, self._returnTo())
 
     def _returnTo(self, ):
-        """What URL should I return to after moving the element and page is refreshed."""
+        """
+          What URL should I return to after moving the element and page is refreshed.
+          When the panel is rendered by another request than the one displaying it
+          (lazy loading, refresh after a transition), the URL of the page displaying
+          the panel is given in the request, it must be an URL of the portal.
+        """
+        return_to = self.request.form.get('actionspanel_return_to', '')
+        if return_to and return_to.startswith(self.portal_url + '/'):
+            return return_to
         return self.request.getURL()
 
     def renderTransitions(self):
@@ -157,7 +633,7 @@ class ActionsPanelView(BrowserView):
           Render the current context available workflow transitions.
         """
         if self.showTransitions:
-            return ViewPageTemplateFile("actions_panel_transitions.pt")(self)
+            return self.transitions_template()
         return ''
 
     def renderEdit(self):
@@ -167,7 +643,7 @@ class ActionsPanelView(BrowserView):
           be redundant.
         """
         if self.showEdit and self.useIcons and self.mayEdit():
-            return ViewPageTemplateFile("actions_panel_edit.pt")(self)
+            return self.edit_template()
         return ''
 
     def getEditAction(self):
@@ -175,22 +651,27 @@ class ActionsPanelView(BrowserView):
          Return 'edit' or 'external_edit' wheter the context is "externally editable"
          or not.
         """
-        edit_action = 'edit'
-
-        portal_quickinstaller = api.portal.get_tool('portal_quickinstaller')
-        external_edit_installed = portal_quickinstaller.isProductInstalled('collective.externaleditor')
+        if self.context.portal_type in self._externalEditorEnabledTypes():
+            return 'external_edit'
+        return 'edit'
 
-        if external_edit_installed:
-            registry = getUtility(IRegistry)
-            # check if enabled
-            if not registry.get('externaleditor.ext_editor', False):
-                return edit_action
-            # check portal type
-            externaleditor_enabled_types = registry.get('externaleditor.externaleditor_enabled_types', [])
-            if self.context.portal_type in externaleditor_enabled_types:
-                edit_action = 'external_edit'
-
-        return edit_action
+    def _externalEditorEnabledTypes(self):
+        """
+          Return the portal_types that are externally editable, this is computed
+          once by request so rendering the edit action for every elements is a lookup.
+        """
+        enabled_types = self.request.get('imio.actionspanel_externaleditor_enabled_types_cachekey', None)
+        if enabled_types is None:
+            enabled_types = frozenset()
+            portal_quickinstaller = api.portal.get_tool('portal_quickinstaller')
+            if portal_quickinstaller.isProductInstalled('collective.externaleditor'):
+                registry = getUtility(IRegistry)
+                # check if enabled
+                if registry.get('externaleditor.ext_editor', False):
+                    enabled_types = frozenset(
+                        registry.get('externaleditor.externaleditor_enabled_types', None) or ())
+            self.request.set('imio.actionspanel_externaleditor_enabled_types_cachekey', enabled_types)
+        return enabled_types
 
     def renderOwnDelete(self):
         """
@@ -198,7 +679,7 @@ class ActionsPanelView(BrowserView):
         """
         if self.showOwnDelete and \
            IContentDeletable(self.context).mayDelete():
-            return ViewPageTemplateFile("actions_panel_own_delete.pt")(self)
+            return self.own_delete_template()
         return ''
 
     def renderActions(self):
@@ -206,21 +687,21 @@ class ActionsPanelView(BrowserView):
           Render actions coming from portal_actions.object_buttons and available on the context.
         """
         if self.showActions:
-            return ViewPageTemplateFile("actions_panel_actions.pt")(self)
+            return self.actions_template()
 
     def renderAddContent(self):
         """
           Render allowed_content_types coming from portal_type.
         """
         if self.showAddContent:
-            return ViewPageTemplateFile("actions_panel_add_content.pt")(self)
+            return self.add_content_template()
 
     def renderHistory(self):
         """
           Render a link to the object's history (@@historyview).
         """
         if self.showHistory and self.useIcons and self.showHistoryForContext():
-            return ViewPageTemplateFile("actions_panel_history.pt")(self)
+            return self.history_template()
 
     def showHistoryForContext(self):
         """
@@ -230,9 +711,11 @@ class ActionsPanelView(BrowserView):
             return False
         return True
 
+    @ram.cache(_history_last_event_has_comments_cachekey)
     def historyLastEventHasComments(self):
         """
           Returns True if the last event of the object's history has a comment.
+          Cached by member until an event is added to the workflow_history of the object.
         """
         adapter = getAdapter(self.context, IImioHistory, 'workflow')
         return adapter.historyLastEventHasComments()
@@ -263,77 +746,136 @@ class ActionsPanelView(BrowserView):
             popup or not.
         """
         res = []
+        workflow, descriptors = self._currentTransitionDescriptors()
+        # Analyse all the user-triggerable transitions that start from this state.
+        for descriptor in descriptors:
+            tInfo = self._transitionInfo(workflow, descriptor)
+            if tInfo is not None:
+                res.append(tInfo)
+
+        self.sortTransitions(res)
+        return res
+
+    def getTransition(self, transitionId):
+        """
+          Return informations about the transition p_transitionId like getTransitions
+          does, but only the guard of this transition is evaluated.
+          Returns None if the transition is not available.
+        """
+        workflow, descriptors = self._currentTransitionDescriptors()
+        for descriptor in descriptors:
+            if descriptor['id'] == transitionId:
+                return self._transitionInfo(workflow, descriptor)
+        return None
+
+    def _currentTransitionDescriptors(self):
+        """
+          Return the workflow of the context and the descriptors of the
+          user-triggerable transitions leaving the current state.
+        """
         # Get the workflow definition for p_obj.
         workflow = self.request.get('imio.actionspanel_workflow_%s_cachekey' % self.context.portal_type, None)
         if not workflow:
             wfTool = api.portal.get_tool('portal_workflow')
             workflows = wfTool.getWorkflowsFor(self.context)
             if not workflows:
-                return res
+                return None, ()
             workflow = workflows[0]
             self.request.set('imio.actionspanel_workflow_%s_cachekey' % self.context.portal_type, workflow)
         # What is the current state for self.context?
-        currentState = workflow._getWorkflowStateOf(self.context)
+        currentState = self._currentState(workflow)
         if not currentState:
-            return res
+            return workflow, ()
         # Get the transitions to confirm from the config.
+        # check if the transition have to be confirmed regarding
+        # current object meta_type/portal_type and transition to trigger
         toConfirm = self._transitionsToConfirmInfos()
-        # Analyse all the transitions that start from this state.
-        for transitionId in currentState.transitions:
+        confirmViews = tuple(
+            [(transitionId,
+              toConfirm.get('%s.%s' % (self.context.meta_type, transitionId), '') or
+              toConfirm.get('%s.%s' % (self.context.portal_type, transitionId), ''))
+             for transitionId in currentState.transitions])
+        return workflow, self._transitionDescriptors(workflow, currentState, confirmViews)
+
+    def _transitionInfo(self, workflow, descriptor):
+        """
+          Check the guard of the transition described by p_descriptor and return
+          informations about it as a TransitionInfo, None if the transition must not be displayed.
+        """
+        transition = workflow.transitions[descriptor['id']]
+        if transition.guard is None:
+            mayTrigger = True
+        else:
+            mayTrigger = self._checkTransitionGuard(transition.guard,
+                                                    self.member,
+                                                    workflow,
+                                                    self.context)
+        if not mayTrigger and not isinstance(mayTrigger, No):
+            return None
+        # Information about this transition must be part of result.
+        content_url = self.contextURL()
+        reason = None
+        if not mayTrigger:
+            # mayTrigger.msg is a 'zope.i18nmessageid.message.Message', translate it now
+            reason = self._translate(mayTrigger.msg)
+        return TransitionInfo(descriptor,
+                              may_trigger=bool(mayTrigger),
+                              url=descriptor['url'] % {'content_url': content_url,
+                                                       'portal_url': '',
+                                                       'folder_url': ''},
+                              icon=descriptor['icon'] % {'content_url': content_url,
+                                                         'portal_url': self.portal_url,
+                                                         'folder_url': ''},
+                              reason=reason)
+
+    def _currentState(self, workflow):
+        """
+          Current state of the element in p_workflow, taken from the brain if available
+          so the workflow_history of the element is not loaded.
+        """
+        if self.brain is not None and workflow.state_var == 'review_state':
+            state = workflow.states.get(self.brain.review_state or '')
+            if state is not None:
+                return state
+        return workflow._getWorkflowStateOf(self.context)
+
+    @ram.cache(_transition_descriptors_cachekey)
+    def _transitionDescriptors(self, workflow, state, confirmViews):
+        """
+          Return informations about the user triggerable transitions leaving p_state
+          that do not depend on the element : translated title, confirmation view,
+          url and icon still to be formatted, ...
+          p_confirmViews is a tuple of (transition id, confirmation view) for every
+          transition leaving p_state.
+          This is the same for every elements in the same state so it is cached,
+          only the guard check and the urls depend on the element.
+        """
+        res = []
+        for transitionId, confirmation_view in confirmViews:
             transition = workflow.transitions.get(transitionId, None)
             if transition and (transition.trigger_type == TRIGGER_USER_ACTION) \
                and transition.actbox_name:
-                # We have a possible candidate for a user-triggerable transition
-                if transition.guard is None:
-                    mayTrigger = True
-                else:
-                    mayTrigger = self._checkTransitionGuard(transition.guard,
-                                                            self.member,
-                                                            workflow,
-                                                            self.context)
-                if mayTrigger or isinstance(mayTrigger, No):
-                    # Information about this transition must be part of result.
-                    # check if the transition have to be confirmed regarding
-                    # current object meta_type/portal_type and transition to trigger
-                    preNameMetaType = '%s.%s' % (self.context.meta_type, transition.id)
-                    preNamePortalType = '%s.%s' % (self.context.portal_type, transition.id)
-                    confirmation_view = toConfirm.get(preNameMetaType, '') or toConfirm.get(preNamePortalType, '')
-                    tInfo = {
-                        'id': transition.id,
-                        # if the transition.id is not translated, use translated transition.title...
-                        'title': translate(transition.title,
-                                           domain="plone",
-                                           context=self.request),
-                        'description': transition.description,
-                        'name': transition.actbox_name, 'may_trigger': True,
-                        'confirm': bool(confirmation_view),
-                        'confirmation_view': confirmation_view or DEFAULT_CONFIRM_VIEW,
-                        'url': transition.actbox_url %
-                            {'content_url': self.context.absolute_url(),
-                             'portal_url': '',
-                             'folder_url': ''},
-                        'icon': transition.actbox_icon %
-                            {'content_url': self.context.absolute_url(),
-                             'portal_url': self.portal_url,
-                             'folder_url': ''},
-                    }
-                    if not mayTrigger:
-                        tInfo['may_trigger'] = False
-                        # mayTrigger.msg is a 'zope.i18nmessageid.message.Message', translate it now
-                        tInfo['reason'] = translate(mayTrigger.msg, context=self.request)
-                    res.append(tInfo)
-
-        self.sortTransitions(res)
-        return res
+                res.append({
+                    'id': transition.id,
+                    # if the transition.id is not translated, use translated transition.title...
+                    'title': self._translate(transition.title, domain="plone"),
+                    'description': transition.description,
+                    'name': transition.actbox_name,
+                    'confirm': bool(confirmation_view),
+                    'confirmation_view': confirmation_view or DEFAULT_CONFIRM_VIEW,
+                    'url': transition.actbox_url,
+                    'icon': transition.actbox_icon,
+                })
+        return tuple(res)
 
     def _transitionsToConfirmInfos(self):
         transitions = self._transitionsToConfirm()
         if type(transitions) is not dict:
             transitions = dict([(t, DEFAULT_CONFIRM_VIEW) for t in transitions])
-        else:
-            for name, confirm_view in transitions.iteritems():
-                if not confirm_view:
-                    transitions[name] = DEFAULT_CONFIRM_VIEW
+        elif not all(transitions.itervalues()):
+            # do not change the dict in place as it may be cached
+            transitions = dict([(name, confirm_view or DEFAULT_CONFIRM_VIEW)
+                                for name, confirm_view in transitions.iteritems()])
         return transitions
 
     def _transitionsToConfirm(self):
@@ -350,35 +892,65 @@ class ActionsPanelView(BrowserView):
           {'Document.reject': 'simpleconfirmview', 'Mytype.cancel': 'messageconfirmview'}
           If no confirmation view is provided (empty string) imio.actionspanel confirmation
           default view is used instead.
+          The registry record is read once by request and parsed once by process,
+          a copy of the parsed dict is returned so it may be changed by subclasses.
         """
-        values = api.portal.get_registry_record(
-            'imio.actionspanel.browser.registry.IImioActionsPanelConfig.transitions')
+        values = self.request.get('imio.actionspanel_transitions_to_confirm_cachekey', None)
         if values is None:
+            values = tuple(api.portal.get_registry_record(
+                'imio.actionspanel.browser.registry.IImioActionsPanelConfig.transitions') or ())
+            self.request.set('imio.actionspanel_transitions_to_confirm_cachekey', values)
+        if not values:
             return ()
-        return dict([val.split('|') for val in values])
+        return dict(parseTransitionsToConfirm(values))
+
+    def _queuedTransitions(self):
+        """
+          Return the 'portal_type.transition' or 'meta_type.transition' values of
+          transitions that are queued instead of triggered immediately.
+          The registry record is read once by request.
+        """
+        values = self.request.get('imio.actionspanel_queued_transitions_cachekey', None)
+        if values is None:
+            registry = getUtility(IRegistry)
+            values = frozenset(
+                [value.split('|')[0] for value in
+                 registry.get('imio.actionspanel.browser.registry.IImioActionsPanelConfig.queued_transitions',
+                              None) or ()])
+            self.request.set('imio.actionspanel_queued_transitions_cachekey', values)
+        return values
+
+    def isQueuedTransition(self, transition):
+        """Is p_transition queued for self.context instead of triggered immediately?"""
+        values = self._queuedTransitions()
+        return '%s.%s' % (self.context.meta_type, transition) in values or \
+            '%s.%s' % (self.context.portal_type, transition) in values
 
     def _checkTransitionGuard(self, guard, sm, wf_def, ob):
         """
           This method is similar to DCWorkflow.Guard.check, but allows to
           retrieve the truth value as a appy.gen.No instance, not simply "1"
           or "0".
+          Roles, groups and permissions of the member are computed once for p_ob
+          and reused for every transitions.
         """
+        stats.increment(self.request, 'guard_evaluations')
         u_roles = None
         if wf_def.manager_bypass:
             # Possibly bypass.
-            u_roles = sm.getRolesInContext(ob)
+            u_roles = self._getGuardRoles(sm, ob)
             if 'Manager' in u_roles:
                 return 1
         if guard.permissions:
             for p in guard.permissions:
-                if _checkPermission(p, ob):
+                if self._checkGuardPermission(p, ob):
                     break
             else:
                 return 0
         if guard.roles:
             # Require at least one of the given roles.
             if u_roles is None:
-                u_roles = sm.getRolesInContext(ob)
+                u_roles = self._getGuardRoles(sm, ob)
             for role in guard.roles:
                 if role in u_roles:
                     break
@@ -386,14 +958,7 @@ class ActionsPanelView(BrowserView):
                 return 0
         if guard.groups:
             # Require at least one of the specified groups.
-            u = sm.getUser()
-            b = aq_base(u)
-            if hasattr(b, 'getGroupsInContext'):
-                u_groups = u.getGroupsInContext(ob)
-            elif hasattr(b, 'getGroups'):
-                u_groups = u.getGroups()
-            else:
-                u_groups = ()
+            u_groups = self._getGuardGroups(sm, ob)
             for group in guard.groups:
                 if group in u_groups:
                     break
@@ -401,27 +966,92 @@ class ActionsPanelView(BrowserView):
                 return 0
         expr = guard.expr
         if expr is not None:
-            econtext = createExprContext(StateChangeInfo(ob, wf_def))
-            res = expr(econtext)
-            return res
+            return self._evaluateGuardExpression(expr, wf_def, ob)
         return 1
 
+    @memoize
+    def _getGuardRoles(self, sm, ob):
+        """Roles of p_sm on p_ob, used to check transition guards."""
+        return sm.getRolesInContext(ob)
+
+    @memoize
+    def _getGuardGroups(self, sm, ob):
+        """Groups of p_sm on p_ob, used to check transition guards."""
+        u = sm.getUser()
+        b = aq_base(u)
+        if hasattr(b, 'getGroupsInContext'):
+            return u.getGroupsInContext(ob)
+        elif hasattr(b, 'getGroups'):
+            return u.getGroups()
+        return ()
+
+    @memoize
+    def _checkGuardPermission(self, permission, ob):
+        """Check p_permission on p_ob, used to check transition guards."""
+        return _checkPermission(permission, ob)
+
+    @memoize
+    def _getGuardExprContext(self, wf_def, ob):
+        """Expression context used to evaluate guard expressions on p_ob."""
+        return createExprContext(StateChangeInfo(ob, wf_def))
+
+    def _evaluateGuardExpression(self, expr, wf_def, ob):
+        """
+          Evaluate the guard expression p_expr on p_ob.  If the expression is
+          listed in self.CONTEXT_INDEPENDENT_GUARD_EXPRESSIONS, the result only depends
+          on the workflow state so it is computed once by request for every elements
+          in the same state.
+        """
+        if expr.text not in self.CONTEXT_INDEPENDENT_GUARD_EXPRESSIONS:
+            return expr(self._getGuardExprContext(wf_def, ob))
+        cache = self.request.get('imio.actionspanel_guard_expressions_cachekey', None)
+        if cache is None:
+            cache = {}
+            self.request.set('imio.actionspanel_guard_expressions_cachekey', cache)
+        key = (wf_def.getId(), self._currentState(wf_def).getId(), expr.text)
+        if key not in cache:
+            cache[key] = expr(self._getGuardExprContext(wf_def, ob))
+        else:
+            stats.increment(self.request, 'guard_expression_cache_hits')
+        return cache[key]
+
     def getTransitionTitle(self, transition):
         '''Render the transition title including portal_type title if necessary.'''
         transition_title = transition['title']
         if self.appendTypeNameToTransitionLabel:
+            transition_title = u"{0} {1}".format(transition_title, self._translatedTypeTitle())
+        return transition_title
+
+    def _translatedTypeTitle(self):
+        '''Translated title of the element portal_type, computed once by request for every portal_type.'''
+        key = 'imio.actionspanel_type_title_%s_cachekey' % self.context.portal_type
+        title = self.request.get(key, None)
+        if title is None:
             typesTool = api.portal.get_tool('portal_types')
             type_info = typesTool.getTypeInfo(self.context)
-            transition_title = u"{0} {1}".format(transition_title,
-                                                 translate(type_info.title,
-                                                           domain=type_info.i18n_domain,
-                                                           context=self.request))
-        return transition_title
+            title = self._translate(type_info.title, domain=type_info.i18n_domain)
+            self.request.set(key, title)
+        return title
+
+    def _translate(self, msgid, domain=None):
+        '''
+          Translate p_msgid in the request language using the translation table,
+          a 'zope.i18nmessageid.message.Message' is translated in its own domain.
+        '''
+        language = self.request.get('LANGUAGE', None)
+        if not language:
+            return translate(msgid, domain=domain, context=self.request)
+        default = mapping = None
+        if isinstance(msgid, Message):
+            domain = msgid.domain
+            default = msgid.default
+            mapping = msgid.mapping
+        return translateForLanguage(msgid, domain, language, default, mapping)
 
     def computeTriggerTransitionLink(self, transition):
         """ """
         return "{0}/{1}?transition={2}&actionspanel_view_name={3}{4}".format(
-            self.context.absolute_url(),
+            self.contextURL(),
             transition['confirmation_view'],
             transition['id'],
             self.__name__,
@@ -431,7 +1061,7 @@ class ActionsPanelView(BrowserView):
         """ """
         if not transition['confirm']:
             return "triggerTransition(baseUrl='{0}', viewName='@@triggertransition', transition='{1}', this);".format(
-                self.context.absolute_url(),
+                self.contextURL(),
                 transition['id'])
         else:
             return ''
@@ -439,8 +1069,8 @@ class ActionsPanelView(BrowserView):
     def computeDeleteGivenUIDOnClick(self):
         """ """
         return "deleteElement(baseUrl='{0}', viewName='@@delete_givenuid', object_uid='{1}');".format(
-            self.context.absolute_url(),
-            self.context.UID())
+            self.contextURL(),
+            self.contextUID())
 
     def addableContents(self):
         """
@@ -454,45 +1084,90 @@ class ActionsPanelView(BrowserView):
 
     def listObjectButtonsActions(self):
         """
-          Return a list of object_buttons actions coming from portal_actions.
+          Return a list of object_buttons actions coming from portal_actions and
+          from other action providers (portal_types, ...) not in IGNORABLE_PROVIDERS,
+          in the order of the action providers.
+          For portal_actions, only the object_buttons category is considered and actions
+          to keep are computed once by request, for other providers, only object_buttons
+          actions to keep are considered, only conditions and permissions are checked
+          for every element.
         """
         actionsTool = api.portal.get_tool('portal_actions')
-        # we only want object_buttons, so ignore other categories and providers
-        IGNORABLE_CATEGORIES = ['site_actions', 'object', 'controlpanel/controlpanel_addons', 'workflow',
-                                'portal_tabs', 'global', 'document_actions', 'user', 'folder_buttons', 'folder']
-        IGNORABLE_PROVIDERS = ['portal_workflow', ]
-        allActions = actionsTool.listFilteredActionsFor(self.context,
-                                                        ignore_providers=IGNORABLE_PROVIDERS,
-                                                        ignore_categories=IGNORABLE_CATEGORIES)
-
-        objectButtonActions = []
-        if 'object_buttons' in allActions:
-            objectButtonActions = allActions['object_buttons']
-
+        # expression context of Plone, providing 'checkPermission', 'globals_view', ...
+        ec = actionsTool._getExprContext(self.context)
+        infos = []
+        for provider_name in actionsTool.listActionProviders():
+            if provider_name == 'portal_actions':
+                actions = self._objectButtonsActions()
+            elif provider_name in self.IGNORABLE_PROVIDERS:
+                continue
+            else:
+                actions = self._providerObjectButtonsActions(provider_name)
+            infos.extend([ActionInfo(action, ec) for action in actions])
         res = []
-        for action in objectButtonActions:
-            if (self.ACCEPTABLE_ACTIONS and action['id'] in self.ACCEPTABLE_ACTIONS) or \
-               (not self.ACCEPTABLE_ACTIONS and not action['id'] in self.IGNORABLE_ACTIONS):
-                act = action.copy()
-                # We try to append the url of the icon of the action
-                # look on the action itself
-                if act['icon']:
-                    # make sure we only have the action icon name not a complete
-                    # path including portal_url or so, just take care that we do not have
-                    # an image in a static resource folder
-                    splittedIconPath = act['icon'].split('/')
-                    if len(splittedIconPath) > 1 and '++resource++' in splittedIconPath[-2]:
-                        # keep last 2 parts of the path
-                        act['icon'] = '/'.join((splittedIconPath[-2], splittedIconPath[-1], ))
-                    else:
-                        act['icon'] = splittedIconPath[-1]
-                res.append(act)
+        for info in infos:
+            if not (info['visible'] and info['allowed'] and info['available']):
+                continue
+            act = info.copy()
+            # We try to append the url of the icon of the action
+            # look on the action itself
+            if act['icon']:
+                # make sure we only have the action icon name not a complete
+                # path including portal_url or so, just take care that we do not have
+                # an image in a static resource folder
+                splittedIconPath = act['icon'].split('/')
+                if len(splittedIconPath) > 1 and '++resource++' in splittedIconPath[-2]:
+                    # keep last 2 parts of the path
+                    act['icon'] = '/'.join((splittedIconPath[-2], splittedIconPath[-1], ))
+                else:
+                    act['icon'] = splittedIconPath[-1]
+            res.append(act)
         return res
 
+    def _isKeptAction(self, action_id):
+        """Should action p_action_id be kept regarding ACCEPTABLE_ACTIONS and IGNORABLE_ACTIONS?"""
+        return bool((self.ACCEPTABLE_ACTIONS and action_id in self.ACCEPTABLE_ACTIONS) or
+                    (not self.ACCEPTABLE_ACTIONS and action_id not in self.IGNORABLE_ACTIONS))
+
+    def _providerObjectButtonsActions(self, provider_name):
+        """
+          Return the object_buttons actions of the element coming from action provider
+          p_provider_name (like the type actions of portal_types) to consider regarding
+          ACCEPTABLE_ACTIONS and IGNORABLE_ACTIONS.  Actions of other categories are not
+          considered so their conditions and permissions are not checked.
+        """
+        provider = getattr(api.portal.get_tool('portal_actions'), provider_name, None)
+        if not IActionProvider.providedBy(provider):
+            return []
+        return [action for action in provider.listActions(object=self.context)
+                if action.getCategory() == 'object_buttons' and self._isKeptAction(action.getId())]
+
+    def _objectButtonsActions(self):
+        """
+          Return the portal_actions.object_buttons actions to consider regarding
+          ACCEPTABLE_ACTIONS and IGNORABLE_ACTIONS.  This does not depend on the element
+          so it is computed once by request.
+        """
+        key = 'imio.actionspanel_object_buttons_%s_%s_cachekey' % (self.ACCEPTABLE_ACTIONS,
+                                                                     self.IGNORABLE_ACTIONS)
+        actions = self.request.get(key, None)
+        if actions is None:
+            actions = []
+            category = api.portal.get_tool('portal_actions').get('object_buttons', None)
+            if category is not None:
+                for action in category.objectValues():
+                    if not IAction.providedBy(action):
+                        continue
+                    if self._isKeptAction(action.getId()):
+                        actions.append(action)
+            self.request.set(key, actions)
+        return actions
+
     def triggerTransition(self, transition, comment, redirect=True):
         """
           Triggers a p_transition on self.context.
         """
+        stats.recordRetry(self.request, 'triggertransition')
         wfTool = api.portal.get_tool('portal_workflow')
         plone_utils = api.portal.get_tool('plone_utils')
         try:
@@ -552,6 +1227,175 @@ class ActionsPanelView(BrowserView):
         return redirectToUrl
 
 
+class ActionsPanelBatchView(BrowserView):
+    """
+      Render the actions panel of several elements at once.
+      Callable using classic traverse in a url :
+      http://nohost/plonesite/@@actions_panel_batch?uids:list=UID1&uids:list=UID2
+      An 'actionspanel_view_name' may be given to use another actions panel view than
+      'actions_panel' and 'options' may be a JSON dict of parameters passed to the
+      actions panel view (useIcons, showArrows, ...).
+      Returns a JSON dict with UID as key and rendered panel as value.
+    """
+
+    def __call__(self):
+        """ """
+        self.request.response.setHeader('content-type', 'application/json')
+        return json.dumps(self._renderBatch())
+
+    def _getElements(self):
+        """Return the elements to render, get every elements using one single catalog query."""
+        uids = self.request.form.get('uids', [])
+        if isinstance(uids, basestring):
+            uids = [uids]
+        if not uids:
+            return []
+        return api.portal.get_tool('portal_catalog')(UID=uids)
+
+    def _renderBatch(self, **kwargs):
+        """Render elements using the actions panel view and options given in the request."""
+        form = self.request.form
+        view_name = form.get('actionspanel_view_name', 'actions_panel')
+        options = parsePanelOptions(form.get('options'))
+        options.update(kwargs)
+        elements = self._getElements()
+        if not elements:
+            return {}
+        actionspanel_view = queryMultiAdapter((self.context, self.request), name=view_name)
+        if actionspanel_view is None:
+            # the actions panel view may be registered for the elements only, not for the context
+            element = elements[0]
+            if ICatalogBrain.providedBy(element):
+                element = element.getObject()
+            actionspanel_view = getMultiAdapter((element, self.request), name=view_name)
+        return actionspanel_view.renderBatch(elements, **options)
+
+
+class ActionsPanelJSONView(ActionsPanelBatchView):
+    """
+      Return the data displayed by the actions panel of one or several elements
+      as JSON so the panel may be rendered client side.
+      Callable using classic traverse in a url :
+      http://nohost/plonesite/folder/element/@@actions_panel_json or
+      http://nohost/plonesite/@@actions_panel_json?uids:list=UID1&uids:list=UID2
+      Parameters are the same as for @@actions_panel_batch.
+      Returns a JSON dict with UID as key and panel data as value, an ETag is computed
+      so if the data did not change, a 304 is returned.
+    """
+
+    def __call__(self):
+        """ """
+        response = self.request.response
+        body = json.dumps(self._renderBatch(asData=True), sort_keys=True)
+        etag = '"%s"' % md5(body).hexdigest()
+        response.setHeader('ETag', etag)
+        response.setHeader('Cache-Control', 'private, max-age=0, must-revalidate')
+        if self.request.get_header('If-None-Match') == etag:
+            response.setStatus(304)
+            return ''
+        response.setHeader('content-type', 'application/json')
+        return body
+
+    def _getElements(self):
+        """If no uids are given, return data for the context."""
+        return super(ActionsPanelJSONView, self)._getElements() or [self.context]
+
+
+class ActionsPanelStatsView(BrowserView):
+    """
+      Return, as JSON, the actions panel statistics collected by the process
+      when instrumentation is enabled (see imio.actionspanel.stats).
+      Callable using classic traverse in a url :
+      http://nohost/plonesite/@@actions_panel_stats, add ?reset=1 to reset statistics.
+    """
+
+    def __call__(self):
+        """ """
+        res = stats.processStats()
+        res['enabled'] = stats.isEnabled()
+        if self.request.get('reset') == '1':
+            stats.resetProcessStats()
+        self.request.response.setHeader('content-type', 'application/json')
+        return json.dumps(res, sort_keys=True)
+
+
+class FolderPositionTypeAwareView(BrowserView):
+    """
+      Change position of an element in an ordered folder regarding elements of same portal_type,
+      so when moving an element up or down, it takes the place of the previous/next element of
+      same portal_type.  This replaces the 'folder_position_typeaware' skin script, elements of
+      the folder are not waked up and only elements which position changed are reindexed.
+      Callable using classic traverse in a url :
+      http://nohost/plonesite/folder/@@folder_position_typeaware?position=up&id=element_id
+    """
+
+    def __call__(self, position, id, template_id='folder_contents'):
+        """ """
+        position = position.lower()
+        allObjectIds = list(self.context.objectIds())
+        pos = allObjectIds.index(id)
+        # positions between first and last changed after the move
+        first = last = pos
+        if position in ('up', 'down'):
+            sameTypeIds = self._sameTypeIds(getattr(self.context, id).portal_type)
+            step = position == 'up' and -1 or 1
+            neighbour = pos + step
+            while 0 <= neighbour < len(allObjectIds) and allObjectIds[neighbour] not in sameTypeIds:
+                neighbour += step
+            if 0 <= neighbour < len(allObjectIds):
+                if position == 'up':
+                    self.context.moveObjectsUp(id, delta=pos - neighbour)
+                    first = neighbour
+                else:
+                    self.context.moveObjectsDown(id, delta=neighbour - pos)
+                    last = neighbour
+        elif position == 'top':
+            self.context.moveObjectsToTop(id)
+            first = 0
+        elif position == 'bottom':
+            self.context.moveObjectsToBottom(id)
+            last = len(allObjectIds) - 1
+        elif position == 'ordered':
+            # order folder by field, id in this case is the field
+            self.context.orderObjects(id)
+            first = 0
+            last = len(allObjectIds) - 1
+
+        if position == 'ordered':
+            api.portal.get_tool('plone_utils').reindexOnReorder(self.context)
+        else:
+            self._reindexPositions(allObjectIds[first:last + 1])
+
+        api.portal.get_tool('plone_utils').addPortalMessage(_plone(u'Item\'s position has changed.'))
+        if '://' not in template_id:
+            template_id = '{0}/{1}'.format(self.context.absolute_url(), template_id)
+        elif not template_id.startswith(api.portal.get().absolute_url() + '/'):
+            # never redirect outside the portal
+            template_id = '{0}/folder_contents'.format(self.context.absolute_url())
+        return self.request.response.redirect(template_id)
+
+    def _sameTypeIds(self, portal_type):
+        """Ids of the elements of the context of given p_portal_type, elements are not waked up."""
+        catalog = api.portal.get_tool('portal_catalog')
+        brains = catalog.unrestrictedSearchResults(path={'query': '/'.join(self.context.getPhysicalPath()),
+                                                         'depth': 1},
+                                                   portal_type=portal_type)
+        return set([brain.getId for brain in brains])
+
+    def _reindexPositions(self, ids):
+        """
+          Reindex position of elements of given p_ids, this is what
+          plone_utils.reindexOnReorder does but only for elements that moved.
+        """
+        if not api.user.get_current().has_permission(ModifyPortalContent, self.context):
+            return
+        catalog = api.portal.get_tool('portal_catalog')
+        for obj_id in ids:
+            catalog.reindexObject(getattr(self.context, obj_id),
+                                  ['getObjPositionInParent'],
+                                  update_metadata=0)
+
+
 class DeleteGivenUidView(BrowserView):
     """
       View that ease deletion of elements by not checking the 'Delete objects' permission on parent
@@ -565,13 +1409,17 @@ class DeleteGivenUidView(BrowserView):
         self.request = request
         self.portal = api.portal.get()
 
-    def __call__(self, object_uid, redirect=True):
-        """ """
-        # redirect can by passed by jQuery, in this case, we receive '0' or '1'
+    def __call__(self, object_uid, redirect=True, refresh_panel=False):
+        """
+          If p_refresh_panel is True, a JSON dict is returned telling if the element
+          was removed so only the relevant row is removed from the faceted navigation.
+        """
+        # redirect and refresh_panel can by passed by jQuery, in this case, we receive '0' or '1'
         if redirect == '0':
             redirect = False
         elif redirect == '1':
             redirect = True
+        refresh_panel = refresh_panel in (True, '1')
         # Get the object to delete
         # try to get it from the portal_catalog
         catalog_brains = self.context.portal_catalog(UID=object_uid)
@@ -606,6 +1454,9 @@ class DeleteGivenUidView(BrowserView):
 
         # Redirect the user to the correct page and display the correct message.
         self.portal.plone_utils.addPortalMessage(**msg)
+        if refresh_panel:
+            self.request.response.setHeader('content-type', 'application/json')
+            return json.dumps({'uid': object_uid, 'removed': msg['type'] == 'info'})
         if redirect:
             return self._findViewablePlace(obj)
 
@@ -621,3 +1472,54 @@ class DeleteGivenUidView(BrowserView):
         while (not self.member.has_permission('View', parent) and not parent.meta_type == 'Plone Site'):
             parent = parent.getParentNode()
         return parent.absolute_url()
+
+
+class DeleteGivenUidsView(BrowserView):
+    """
+      Same as DeleteGivenUidView but for several elements at once, elements are get using one
+      single catalog query and removed by parent.  The user must be able to delete every element
+      (IContentDeletable.mayDelete), elements he may not delete are not removed.
+      Callable using classic traverse in a url :
+      http://nohost/plonesite/delete_givenuids?uids:list=UID1&uids:list=UID2
+      Returns a JSON dict with UID as key and a dict with 'status' ('deleted', 'unauthorized',
+      'not_found' or 'error') and 'message' as value.
+    """
+    def __init__(self, context, request):
+        super(DeleteGivenUidsView, self).__init__(context, request)
+        self.context = context
+        self.request = request
+        self.portal = api.portal.get()
+
+    def __call__(self, uids):
+        """ """
+        if isinstance(uids, basestring):
+            uids = [uids]
+        res = dict([(uid, {'status': 'not_found', 'message': ''}) for uid in uids])
+        # Get the objects to delete
+        # try to get them from the portal_catalog, if not found, try to get them from the uid_catalog
+        catalog_brains = list(self.portal.portal_catalog(UID=uids))
+        missing_uids = set(uids).difference([brain.UID for brain in catalog_brains])
+        if missing_uids:
+            catalog_brains += list(self.portal.uid_catalog(UID=list(missing_uids)))
+
+        # we use an adapter to manage if we may delete the objects
+        deletable = {}
+        for brain in catalog_brains:
+            obj = brain.getObject()
+            if IContentDeletable(obj).mayDelete():
+                deletable['/'.join(obj.getPhysicalPath())] = brain.UID, obj
+            else:
+                res[brain.UID] = {'status': 'unauthorized', 'message': ''}
+        for uid, obj in deletable.values():
+            res[uid] = {'status': 'deleted', 'message': ''}
+        for obj, exc in unrestrictedRemoveGivenObjects([obj for uid, obj in deletable.values()]):
+            uid = deletable['/'.join(obj.getPhysicalPath())][0]
+            res[uid] = {'status': 'error', 'message': translate(exc.message, context=self.request)}
+
+        deleted = len([uid for uid in res if res[uid]['status'] == 'deleted'])
+        msg = _('objects_deleted',
+                default=u'${deleted} element(s) deleted, ${failed} element(s) could not be deleted.',
+                mapping={'deleted': deleted, 'failed': len(res) - deleted})
+        self.portal.plone_utils.addPortalMessage(msg, type=deleted == len(res) and 'info' or 'warning')
+        self.request.response.setHeader('content-type', 'application/json')
+        return json.dumps(res)
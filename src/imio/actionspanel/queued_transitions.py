@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# File: queued_transitions.py
+#
+# GNU General Public License (GPL)
+#
+"""
+  Queue of workflow transitions triggered later, outside of the request of the
+  user that asked for it.  Transitions to queue are defined in the 'queued_transitions'
+  record of the registry, jobs are stored in the portal annotations and are processed
+  by the @@process_queued_transitions view that is supposed to be called by a clock server.
+"""
+
+import logging
+logger = logging.getLogger('imio.actionspanel')
+
+import time
+import uuid
+
+import transaction
+from BTrees.OOBTree import OOBTree
+from persistent.mapping import PersistentMapping
+from ZODB.POSException import ConflictError
+
+from zope.annotation.interfaces import IAnnotations
+from zope.i18n import translate
+
+from plone import api
+
+from Products.CMFCore.WorkflowCore import WorkflowException
+
+ANNOTATION_KEY = 'imio.actionspanel.queued_transitions'
+
+QUEUED = 'queued'
+DONE = 'done'
+ERROR = 'error'
+
+# processed jobs are kept one day so their status may still be polled
+PROCESSED_JOBS_LIFETIME = 24 * 60 * 60
+
+
+def _jobs(create=False):
+    """Jobs stored in the portal annotations, by job id, None if there is no job."""
+    annotations = IAnnotations(api.portal.get())
+    jobs = annotations.get(ANNOTATION_KEY, None)
+    if jobs is None and create:
+        jobs = annotations[ANNOTATION_KEY] = OOBTree()
+    return jobs
+
+
+def _jobTime(job_id):
+    """Job ids begin with the time the job was queued so jobs are sorted by time."""
+    return float(job_id.split('-')[0])
+
+
+def queueTransition(obj, transition, comment):
+    """Queue p_transition to trigger on p_obj as current user, returns the job id."""
+    job_id = '{0:017.6f}-{1}'.format(time.time(), uuid.uuid4().hex)
+    _jobs(create=True)[job_id] = PersistentMapping(
+        uid=obj.UID(),
+        transition=transition,
+        comment=comment,
+        username=api.user.get_current().getUserName(),
+        status=QUEUED,
+        message=u'')
+    return job_id
+
+
+def getJob(job_id):
+    """Job p_job_id, None if it does not exist."""
+    jobs = _jobs()
+    if not jobs or not job_id:
+        return None
+    return jobs.get(job_id, None)
+
+
+def processQueuedTransitions(request):
+    """
+      Trigger every queued transitions, as the user that queued it, in the order
+      they were queued.  The transaction is committed after every job so a job that
+      fails does not prevent other jobs to be processed.  Old processed jobs are removed.
+      Returns the number of processed jobs.
+    """
+    jobs = _jobs()
+    if not jobs:
+        return 0
+    now = time.time()
+    to_process = []
+    for job_id, job in list(jobs.items()):
+        if job['status'] == QUEUED:
+            to_process.append(job_id)
+        elif now - _jobTime(job_id) > PROCESSED_JOBS_LIFETIME:
+            del jobs[job_id]
+    transaction.commit()
+    for job_id in to_process:
+        _processJob(jobs[job_id], request)
+        transaction.commit()
+    return len(to_process)
+
+
+def _processJob(job, request):
+    """Trigger the transition of p_job and store the outcome in it."""
+    catalog = api.portal.get_tool('portal_catalog')
+    brains = catalog.unrestrictedSearchResults(UID=job['uid'])
+    if not brains:
+        job['status'] = ERROR
+        job['message'] = u'Element with UID {0} not found.'.format(job['uid'])
+        return
+    obj = brains[0]._unrestrictedGetObject()
+    savepoint = transaction.savepoint(optimistic=True)
+    try:
+        with api.env.adopt_user(username=job['username']):
+            api.portal.get_tool('portal_workflow').doActionFor(obj, job['transition'], comment=job['comment'])
+    except ConflictError:
+        raise
+    except WorkflowException, exc:
+        savepoint.rollback()
+        job['status'] = ERROR
+        job['message'] = translate(exc.message, context=request)
+        return
+    except Exception, exc:
+        savepoint.rollback()
+        logger.exception('Error while triggering queued transition "{0}" on {1}'.format(job['transition'],
+                                                                                      job['uid']))
+        job['status'] = ERROR
+        job['message'] = unicode(repr(exc))
+        return
+    job['status'] = DONE
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# File: stats.py
+#
+# GNU General Public License (GPL)
+#
+"""
+  Opt-in instrumentation of the actions panel rendering.
+  Enabled when the IMIO_ACTIONSPANEL_STATS environment variable is set to '1',
+  statistics are collected on the request then, when the request ends, logged
+  thru the 'imio.actionspanel' logger and added to the process statistics
+  exposed by the @@actions_panel_stats view.
+"""
+
+import logging
+logger = logging.getLogger('imio.actionspanel')
+
+import os
+import threading
+
+REQUEST_STATS_KEY = 'imio.actionspanel_stats'
+
+_process_stats = {'requests': 0, 'sections': {}, 'counters': {}}
+
+# requests retried by the publisher because of ConflictErrors, by view,
+# collected even if instrumentation is not enabled
+_retries = {}
+
+_process_stats_lock = threading.Lock()
+
+
+def isEnabled():
+    """Is instrumentation enabled?"""
+    return os.environ.get('IMIO_ACTIONSPANEL_STATS', '') == '1'
+
+
+def _newStats():
+    """Statistics structure, sections are stored by section/portal_type/review_state."""
+    return {'sections': {}, 'counters': {}}
+
+
+def getRequestStats(request):
+    """Statistics collected for p_request, None if instrumentation is disabled."""
+    if not isEnabled():
+        return None
+    stats = request.get(REQUEST_STATS_KEY, None)
+    if stats is None:
+        stats = _newStats()
+        request.set(REQUEST_STATS_KEY, stats)
+    return stats
+
+
+def addSectionTiming(request, section, portal_type, review_state, duration):
+    """Add p_duration, in seconds, of the rendering of p_section for an element."""
+    stats = getRequestStats(request)
+    if stats is None:
+        return
+    states = stats['sections'].setdefault(section, {}).setdefault(portal_type, {})
+    timing = states.setdefault(review_state or '', {'count': 0, 'time': 0.0})
+    timing['count'] += 1
+    timing['time'] += duration
+
+
+def increment(request, counter, value=1):
+    """Increment p_counter (guard evaluations, cache hits, ...) by p_value."""
+    stats = getRequestStats(request)
+    if stats is None:
+        return
+    stats['counters'][counter] = stats['counters'].get(counter, 0) + value
+
+
+def recordRetry(request, name):
+    """
+      Record that p_request, handled by view p_name, is a retry because of a
+      ConflictError, the number of retries is available in the process statistics.
+    """
+    retry_count = getattr(request, 'retry_count', 0)
+    if not retry_count:
+        return
+    logger.info('{0} retried ({1}) because of a conflict: {2}'.format(name, retry_count, request.get('URL', '')))
+    with _process_stats_lock:
+        _retries[name] = _retries.get(name, 0) + 1
+
+
+def _merge(stats, other):
+    """Add p_other statistics to p_stats."""
+    for section, portal_types in other['sections'].items():
+        for portal_type, states in portal_types.items():
+            for review_state, timing in states.items():
+                merged = stats['sections'].setdefault(section, {}).setdefault(
+                    portal_type, {}).setdefault(review_state, {'count': 0, 'time': 0.0})
+                merged['count'] += timing['count']
+                merged['time'] += timing['time']
+    for counter, value in other['counters'].items():
+        stats['counters'][counter] = stats['counters'].get(counter, 0) + value
+
+
+def summary(stats):
+    """Text summary of p_stats, slowest sections first."""
+    timings = []
+    for section, portal_types in stats['sections'].items():
+        for portal_type, states in portal_types.items():
+            for review_state, timing in states.items():
+                timings.append((timing['time'], section, portal_type, review_state, timing['count']))
+    timings.sort(reverse=True)
+    lines = ['{0} {1} {2}: {3} renders in {4:.4f}s'.format(section, portal_type, review_state, count, duration)
+             for duration, section, portal_type, review_state, count in timings]
+    lines.extend(['{0}: {1}'.format(counter, value) for counter, value in sorted(stats['counters'].items())])
+    return '\n'.join(lines)
+
+
+def processStats():
+    """Copy of the statistics collected since the process started or since last reset."""
+    with _process_stats_lock:
+        res = _newStats()
+        _merge(res, _process_stats)
+        res['requests'] = _process_stats['requests']
+        res['conflict_retries'] = dict(_retries)
+    return res
+
+
+def resetProcessStats():
+    """Reset the process statistics."""
+    with _process_stats_lock:
+        _process_stats['requests'] = 0
+        _process_stats['sections'] = {}
+        _process_stats['counters'] = {}
+        _retries.clear()
+
+
+def onRequestEnd(event):
+    """Log statistics of the ending request and add them to the process statistics."""
+    stats = event.request.get(REQUEST_STATS_KEY, None)
+    if not stats:
+        return
+    logger.info('Actions panel statistics for {0} :\n{1}'.format(event.request.get('URL', ''), summary(stats)))
+    with _process_stats_lock:
+        _process_stats['requests'] += 1
+        _merge(_process_stats, stats)
@@ -2,6 +2,7 @@
 from plone.testing import z2, zca
 from plone.app.testing import PloneWithPackageLayer
 from plone.app.testing import FunctionalTesting
+from plone.app.testing import IntegrationTesting
 import imio.actionspanel
 
 
@@ -15,8 +16,12 @@ ACTIONSPANEL_Z2 = z2.IntegrationTesting(bases=(z2.STARTUP, ACTIONSPANEL_ZCML),
 ACTIONSPANEL_TESTING_PROFILE = PloneWithPackageLayer(
     zcml_filename="testing.zcml",
     zcml_package=imio.actionspanel,
+    gs_profile_id='imio.actionspanel:default',
     additional_z2_products=(),
     name="ACTIONSPANEL_TESTING_PROFILE")
 
 ACTIONSPANEL_TESTING_PROFILE_FUNCTIONAL = FunctionalTesting(
     bases=(ACTIONSPANEL_TESTING_PROFILE,), name="ACTIONSPANEL_TESTING_PROFILE_FUNCTIONAL")
+
+ACTIONSPANEL_TESTING_PROFILE_INTEGRATION = IntegrationTesting(
+    bases=(ACTIONSPANEL_TESTING_PROFILE,), name="ACTIONSPANEL_TESTING_PROFILE_INTEGRATION")
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from OFS.interfaces import IObjectWillBeRemovedEvent
+from OFS.ObjectManager import BeforeDeleteException
+from zope.component import getGlobalSiteManager
+from zope.interface import alsoProvides
+from zope.interface import Interface
+
+from plone import api
+from plone.app.testing import login
+from plone.app.testing import setRoles
+from plone.app.testing import TEST_USER_ID
+from plone.app.testing import TEST_USER_NAME
+
+from imio.actionspanel.interfaces import IActionsPanelLayer
+from imio.actionspanel.testing import ACTIONSPANEL_TESTING_PROFILE_FUNCTIONAL
+from imio.actionspanel.testing import ACTIONSPANEL_TESTING_PROFILE_INTEGRATION
+
+
+class IntegrationTestCase(unittest.TestCase):
+    """Base class for integration tests, the test user is a Manager of the portal."""
+
+    layer = ACTIONSPANEL_TESTING_PROFILE_INTEGRATION
+
+    def setUp(self):
+        self.portal = self.layer['portal']
+        self.request = self.layer['request']
+        alsoProvides(self.request, IActionsPanelLayer)
+        setRoles(self.portal, TEST_USER_ID, ['Manager'])
+        login(self.portal, TEST_USER_NAME)
+        self.wfTool = api.portal.get_tool('portal_workflow')
+        self.wfTool.setChainForPortalTypes(('Document', ), ('simple_publication_workflow', ))
+        self.folder = api.content.create(container=self.portal, type='Folder', id='folder')
+
+    def _clearRequestCaches(self):
+        """Remove values cached on the request by the actions panel."""
+        for key in self.request.other.keys():
+            if key.startswith('imio.actionspanel_'):
+                del self.request.other[key]
+
+
+class FunctionalTestCase(IntegrationTestCase):
+    """Base class for tests of code committing the transaction."""
+
+    layer = ACTIONSPANEL_TESTING_PROFILE_FUNCTIONAL
+
+
+def preventProtectedRemoval(obj, event):
+    """Elements which id starts with 'protected' may not be removed."""
+    if obj.getId().startswith('protected'):
+        raise BeforeDeleteException('This element may not be removed.')
+
+
+class RemovalTestCase(IntegrationTestCase):
+    """Elements which id starts with 'protected' raise a BeforeDeleteException when removed."""
+
+    def setUp(self):
+        super(RemovalTestCase, self).setUp()
+        gsm = getGlobalSiteManager()
+        gsm.registerHandler(preventProtectedRemoval, (Interface, IObjectWillBeRemovedEvent))
+        self.addCleanup(gsm.unregisterHandler, preventProtectedRemoval, (Interface, IObjectWillBeRemovedEvent))
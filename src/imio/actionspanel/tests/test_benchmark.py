@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+  Benchmark of the actions panel rendering at listing scale.
+
+  Folders containing elements using several workflows are created and the
+  @@actions_panel of every element is rendered with various options, one by one
+  then at once with ActionsPanelView.renderBatch and the catalog brains of the
+  elements.  For every folder size, options and rendering, we measure time, ZODB loads, catalog queries, template
+  renders and absolute_url calls by rendered row.  Memory used by transition
+  informations is measured as bytes and objects kept alive by row.
+
+  Behaviour may be changed using environment variables :
+  - IMIO_ACTIONSPANEL_BENCHMARK_SIZES : comma separated folder sizes, "10" by default,
+    use "10,100,1000,10000" for a complete run;
+  - IMIO_ACTIONSPANEL_BENCHMARK_OUTPUT : path of a file the JSON results are written to;
+  - IMIO_ACTIONSPANEL_BENCHMARK_BASELINE : path of a JSON results file of a previous run,
+    the test fails if a counter is higher than in the baseline or if time by row is higher
+    than in the baseline more than IMIO_ACTIONSPANEL_BENCHMARK_TOLERANCE (0.2 by default).
+
+  Counters that do not depend on the machine (ZODB loads, catalog queries, template renders
+  and absolute_url calls) are always compared to the budgets of benchmark_baseline.json,
+  the test fails if a counter is higher than its budget.
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import transaction
+from zope.component import queryUtility
+from zope.ramcache.interfaces.ram import IRAMCache
+
+from plone import api
+from plone.memoize.ram import global_cache
+
+from OFS.Traversable import Traversable
+from Products.Five.browser.pagetemplatefile import ViewPageTemplateFile
+from Products.ZCatalog.Catalog import Catalog
+
+from imio.actionspanel.browser.views import PANEL_CACHE
+from imio.actionspanel.tests.base import FunctionalTestCase
+
+
+# portal_type and workflow of created elements, elements are created alternatively
+WORKFLOWS = (('Document', 'simple_publication_workflow'),
+             ('News Item', 'intranet_workflow'),
+             ('Event', 'plone_workflow'),
+             ('Link', 'one_state_workflow'))
+
+# options used to render the panel, every option is toggled alone then all together
+OPTIONS = (('default', {}),
+           ('showArrows', {'showArrows': True}),
+           ('showHistory', {'showHistory': True}),
+           ('showAddContent', {'showAddContent': True}),
+           ('all', {'showArrows': True, 'showHistory': True, 'showAddContent': True}))
+
+# counters compared to the baseline, time_per_row is compared using the tolerance
+COUNTERS = ('zodb_loads_per_row',
+            'catalog_queries_per_row',
+            'template_renders_per_row',
+            'absolute_url_per_row',
+            'transition_infos_bytes_per_row',
+            'transition_infos_objects_per_row')
+
+# budgets of the counters that do not depend on the machine, always checked
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+
+
+@contextmanager
+def counting(klass, name, counts, key):
+    """Count calls to method p_name of p_klass in p_counts[p_key]."""
+    original = klass.__dict__[name]
+
+    def wrapper(*args, **kwargs):
+        counts[key] += 1
+        return original(*args, **kwargs)
+    setattr(klass, name, wrapper)
+    try:
+        yield
+    finally:
+        setattr(klass, name, original)
+
+
+class TestActionsPanelBenchmark(FunctionalTestCase):
+
+    def setUp(self):
+        super(TestActionsPanelBenchmark, self).setUp()
+        for portal_type, workflow_id in WORKFLOWS:
+            self.wfTool.setChainForPortalTypes((portal_type, ), (workflow_id, ))
+        self.sizes = [int(size) for size in
+                      os.environ.get('IMIO_ACTIONSPANEL_BENCHMARK_SIZES', '10').split(',')]
+
+    def _createFolder(self, size):
+        """Create a folder containing p_size elements using the various WORKFLOWS."""
+        folder_id = self.portal.invokeFactory('Folder', id='benchmark-{0}'.format(size))
+        folder = self.portal[folder_id]
+        for i in range(size):
+            portal_type = WORKFLOWS[i % len(WORKFLOWS)][0]
+            folder.invokeFactory(portal_type, id='element-{0}'.format(i), title='Element {0}'.format(i))
+        transaction.commit()
+        return folder
+
+    def _clearRAMCaches(self):
+        """Remove values cached in RAM so results do not depend on the order of the measures."""
+        PANEL_CACHE.invalidateAll()
+        # transition descriptors, translations, ... cached using plone.memoize.ram
+        (queryUtility(IRAMCache) or global_cache).invalidateAll()
+
+    def _measure(self, folder, options, batch=False):
+        """
+          Render the panel of every element of p_folder with p_options, if p_batch is True,
+          the catalog brains of the elements are rendered with ActionsPanelView.renderBatch.
+        """
+        self._clearRequestCaches()
+        self._clearRAMCaches()
+        connection = self.portal._p_jar
+        # every elements are ghosts, like at the beginning of a request
+        connection.cacheMinimize()
+        connection.getTransferCounts(clear=True)
+        counts = {'catalog_queries': 0, 'template_renders': 0, 'absolute_url': 0}
+        rows = 0
+        with counting(Catalog, 'searchResults', counts, 'catalog_queries'):
+            with counting(ViewPageTemplateFile, '__call__', counts, 'template_renders'):
+                with counting(Traversable, 'absolute_url', counts, 'absolute_url'):
+                    start = time.time()
+                    if batch:
+                        catalog = api.portal.get_tool('portal_catalog')
+                        brains = catalog(path={'query': '/'.join(folder.getPhysicalPath()), 'depth': 1},
+                                         sort_on='getObjPositionInParent')
+                        view = folder.restrictedTraverse('@@actions_panel')
+                        rows = len(view.renderBatch(brains, **options))
+                    else:
+                        for obj in folder.objectValues():
+                            view = obj.restrictedTraverse('@@actions_panel')
+                            view(**options)
+                            rows += 1
+                    duration = time.time() - start
+        loads = connection.getTransferCounts(clear=True)[0]
+        rows = rows or 1
+        infos_bytes, infos_objects = self._measureTransitionInfos(folder)
+        return {'rows': rows,
+                'transition_infos_bytes_per_row': float(infos_bytes) / rows,
+                'transition_infos_objects_per_row': float(infos_objects) / rows,
+                'time_per_row': duration / rows,
+                'zodb_loads_per_row': float(loads) / rows,
+                'catalog_queries_per_row': float(counts['catalog_queries']) / rows,
+                'template_renders_per_row': float(counts['template_renders']) / rows,
+                'absolute_url_per_row': float(counts['absolute_url']) / rows}
+
+    def _measureTransitionInfos(self, folder):
+        """
+          Keep transition informations of every element of p_folder alive and return
+          the size of these informations and the number of objects they created.
+        """
+        views = [obj.restrictedTraverse('@@actions_panel') for obj in folder.objectValues()]
+        gc.collect()
+        objects_before = len(gc.get_objects())
+        transitions = [view.getTransitions() for view in views]
+        gc.collect()
+        objects = len(gc.get_objects()) - objects_before
+        size = sum([sys.getsizeof(transition) for lst in transitions for transition in lst])
+        return size, objects
+
+    def _compare(self, results, baseline_path, tolerance=None):
+        """
+          Compare p_results to the baseline stored in p_baseline_path, return the list of regressions.
+          Counters missing in the baseline are not compared, time_per_row is only compared if
+          a p_tolerance is given.
+        """
+        with open(baseline_path) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = []
+        for size, measures in results.items():
+            for option_name, measure in measures.items():
+                reference = baseline.get(size, {}).get(option_name)
+                if not reference:
+                    continue
+                for counter in COUNTERS:
+                    if counter in reference and measure[counter] > reference[counter]:
+                        regressions.append('{0} {1} {2}: {3} > {4}'.format(
+                            size, option_name, counter, measure[counter], reference[counter]))
+                if tolerance is not None and \
+                   measure['time_per_row'] > reference['time_per_row'] * (1 + tolerance):
+                    regressions.append('{0} {1} time_per_row: {2} > {3}'.format(
+                        size, option_name, measure['time_per_row'], reference['time_per_row']))
+        return regressions
+
+    def _checkBaseline(self, results):
+        """
+          Compare p_results to the budgets and to the baseline given in the environment
+          if any, return the list of regressions.
+        """
+        regressions = self._compare(results, BUDGETS_PATH)
+        baseline_path = os.environ.get('IMIO_ACTIONSPANEL_BENCHMARK_BASELINE')
+        if baseline_path:
+            tolerance = float(os.environ.get('IMIO_ACTIONSPANEL_BENCHMARK_TOLERANCE', '0.2'))
+            regressions.extend(self._compare(results, baseline_path, tolerance=tolerance))
+        return regressions
+
+    def test_actions_panel_rendering(self):
+        """Render panels of folders of various sizes and compare with the baseline."""
+        results = {}
+        for size in self.sizes:
+            folder = self._createFolder(size)
+            results[str(size)] = dict([(option_name, self._measure(folder, options))
+                                       for option_name, options in OPTIONS])
+            results[str(size)].update([('{0}_batch'.format(option_name), self._measure(folder, options, batch=True))
+                                       for option_name, options in OPTIONS])
+        output_path = os.environ.get('IMIO_ACTIONSPANEL_BENCHMARK_OUTPUT')
+        if output_path:
+            with open(output_path, 'w') as output_file:
+                json.dump(results, output_file, indent=2, sort_keys=True)
+        regressions = self._checkBaseline(results)
+        self.assertFalse(regressions, '\n'.join(regressions))
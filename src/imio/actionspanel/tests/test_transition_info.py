@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from operator import itemgetter
+
+from Products.PageTemplates.PageTemplate import PageTemplate
+from zope.component import getGlobalSiteManager
+from zope.interface import Interface
+from zope.traversing.adapters import DefaultTraversable
+from zope.traversing.interfaces import ITraversable
+
+from imio.actionspanel.browser.views import TransitionInfo
+
+
+def _descriptor(transition_id, title, confirm=False):
+    """Static informations of a transition shared by every elements in the same state."""
+    return {'id': transition_id,
+            'title': title,
+            'description': u'',
+            'confirm': confirm,
+            'confirmation_view': ''}
+
+
+class TestTransitionInfo(unittest.TestCase):
+
+    def setUp(self):
+        self.descriptor = _descriptor('publish', u'Publish')
+        self.info = TransitionInfo(self.descriptor, True, 'http://nohost/plone/doc/publish', 'publish.png')
+        self.blocked = TransitionInfo(self.descriptor, False, 'http://nohost/plone/doc/publish', 'publish.png',
+                                      reason=u'Not allowed')
+
+    def test_getitem(self):
+        """Keys are taken from the descriptor or from the element informations."""
+        self.assertEqual(self.info['id'], 'publish')
+        self.assertEqual(self.info['title'], u'Publish')
+        self.assertTrue(self.info['may_trigger'])
+        self.assertEqual(self.info['url'], 'http://nohost/plone/doc/publish')
+        self.assertEqual(self.info['icon'], 'publish.png')
+        self.assertRaises(KeyError, self.info.__getitem__, 'unknown')
+        # 'reason' is only available if the transition may not be triggered
+        self.assertRaises(KeyError, self.info.__getitem__, 'reason')
+        self.assertEqual(self.blocked['reason'], u'Not allowed')
+
+    def test_keys_get_and_contains(self):
+        """'reason' is hidden if the transition may be triggered."""
+        self.assertEqual(sorted(self.info.keys()),
+                         ['confirm', 'confirmation_view', 'description', 'icon', 'id', 'may_trigger', 'title', 'url'])
+        self.assertEqual(sorted(self.blocked.keys()), sorted(self.info.keys() + ['reason']))
+        self.assertEqual(len(self.info), 8)
+        self.assertFalse('reason' in self.info)
+        self.assertTrue('reason' in self.blocked)
+        self.assertTrue('title' in self.info)
+        self.assertFalse('unknown' in self.info)
+        self.assertEqual(self.info.get('title'), u'Publish')
+        self.assertEqual(self.info.get('reason'), None)
+        self.assertEqual(self.info.get('reason', u'default'), u'default')
+        self.assertEqual(self.blocked.get('reason'), u'Not allowed')
+
+    def test_copy(self):
+        """copy() and dict() return a dict that may be changed without changing the descriptor."""
+        copy = self.info.copy()
+        self.assertTrue(isinstance(copy, dict))
+        self.assertEqual(copy, dict(self.info))
+        self.assertEqual(dict(self.blocked)['reason'], u'Not allowed')
+        copy['title'] = u'Changed'
+        copy['may_trigger'] = False
+        self.assertEqual(self.info['title'], u'Publish')
+        self.assertEqual(self.descriptor['title'], u'Publish')
+        self.assertTrue(self.info['may_trigger'])
+
+    def test_read_only(self):
+        """Informations may not be changed, descriptors are shared by every elements."""
+        self.assertRaises(AttributeError, setattr, self.info, 'may_trigger', False)
+        self.assertRaises(AttributeError, setattr, self.info, 'title', u'Changed')
+        self.assertFalse(hasattr(self.info, '__setitem__'))
+        self.assertTrue(self.info['may_trigger'])
+
+    def test_sort_by_title(self):
+        """Transitions are sorted using itemgetter like dicts."""
+        retract = TransitionInfo(_descriptor('retract', u'Retract'), True, 'url', 'icon')
+        reject = TransitionInfo(_descriptor('reject', u'Reject'), False, 'url', 'icon', reason=u'No')
+        lst = [retract, self.info, reject]
+        lst.sort(key=itemgetter('title'))
+        self.assertEqual([transition['id'] for transition in lst], ['publish', 'reject', 'retract'])
+
+    def test_page_template_access(self):
+        """Informations are available in page templates using path and python expressions."""
+        # path expressions use the ITraversable adapter registered by zope.traversing
+        gsm = getGlobalSiteManager()
+        gsm.registerAdapter(DefaultTraversable, (Interface, ), ITraversable)
+        self.addCleanup(gsm.unregisterAdapter, DefaultTraversable, (Interface, ), ITraversable)
+        template = PageTemplate()
+        template.pt_edit('<p tal:content="transition/title" />'
+                         '<p tal:content="python: transition[\'url\']" />'
+                         '<p tal:condition="not: transition/may_trigger" tal:content="transition/reason" />',
+                         'text/html')
+        rendered = template.pt_render(extra_context={'transition': self.info})
+        self.assertTrue('<p>Publish</p>' in rendered)
+        self.assertTrue('<p>http://nohost/plone/doc/publish</p>' in rendered)
+        self.assertFalse('Not allowed' in rendered)
+        rendered = template.pt_render(extra_context={'transition': self.blocked})
+        self.assertTrue('<p>Not allowed</p>' in rendered)
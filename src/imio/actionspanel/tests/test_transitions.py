@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import transaction
+from Products.CMFCore.interfaces import IActionSucceededEvent
+from zope.component import getGlobalSiteManager
+from zope.interface import Interface
+
+from plone import api
+from plone.app.testing import login
+
+from imio.actionspanel.tests.base import FunctionalTestCase
+from imio.actionspanel.tests.base import IntegrationTestCase
+
+QUEUED_TRANSITIONS_RECORD = 'imio.actionspanel.browser.registry.IImioActionsPanelConfig.queued_transitions'
+
+
+def failOnTransition(obj, event):
+    """Elements which id starts with 'failing' make every transition fail."""
+    if obj.getId().startswith('failing'):
+        raise ValueError('Transition subscriber failed.')
+
+
+class TestConfirmTransitionView(IntegrationTestCase):
+
+    def test_refresh_panel(self):
+        """The refreshed panel is rendered for the page and faceted flag given in the request."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        return_to = self.folder.absolute_url() + '/listing'
+        self.request.form.update({'transition': 'publish',
+                                  'comment': '',
+                                  'form.submitted': '1',
+                                  'refresh_panel': '1',
+                                  'options': '{"showArrows": true}',
+                                  'actionspanel_return_to': return_to,
+                                  'actionspanel_faceted': '1'})
+        res = json.loads(doc.restrictedTraverse('@@triggertransition')())
+        self.assertEqual(api.content.get_state(doc), 'published')
+        self.assertEqual(res['uid'], doc.UID())
+        self.assertFalse(res['removed'])
+        self.assertTrue('data-return-to="{0}"'.format(return_to) in res['html'])
+        self.assertTrue('data-faceted="1"' in res['html'])
+
+
+class TestBatchTriggerTransitionView(IntegrationTestCase):
+
+    def test_batch_trigger_transition(self):
+        """The transition is triggered on every element it is available for."""
+        doc1 = api.content.create(container=self.folder, type='Document', id='doc1')
+        doc2 = api.content.create(container=self.folder, type='Document', id='doc2')
+        doc3 = api.content.create(container=self.folder, type='Document', id='doc3')
+        self.wfTool.doActionFor(doc3, 'publish')
+        self.request.form.update({'uids': [doc1.UID(), doc2.UID(), doc3.UID(), 'unknown_uid'],
+                                  'transition': 'publish',
+                                  'comment': u'Batch publication'})
+        res = json.loads(self.portal.restrictedTraverse('@@batch_triggertransition')())
+        self.assertEqual(res[doc1.UID()], {'status': 'ok', 'message': ''})
+        self.assertEqual(res[doc2.UID()], {'status': 'ok', 'message': ''})
+        # 'publish' is not available for published doc3
+        self.assertEqual(res[doc3.UID()]['status'], 'error')
+        self.assertTrue(res[doc3.UID()]['message'])
+        self.assertEqual(res['unknown_uid']['status'], 'error')
+        self.assertEqual(api.content.get_state(doc1), 'published')
+        self.assertEqual(api.content.get_state(doc2), 'published')
+        self.assertEqual(self.wfTool.getInfoFor(doc1, 'comments'), u'Batch publication')
+
+    def test_batch_trigger_transition_unexpected_error(self):
+        """An unexpected error is reported for the element and its changes are rolled back."""
+        gsm = getGlobalSiteManager()
+        gsm.registerHandler(failOnTransition, (Interface, IActionSucceededEvent))
+        self.addCleanup(gsm.unregisterHandler, failOnTransition, (Interface, IActionSucceededEvent))
+        doc1 = api.content.create(container=self.folder, type='Document', id='doc1')
+        failing = api.content.create(container=self.folder, type='Document', id='failing')
+        doc2 = api.content.create(container=self.folder, type='Document', id='doc2')
+        self.request.form.update({'uids': [doc1.UID(), failing.UID(), doc2.UID()], 'transition': 'publish'})
+        res = json.loads(self.portal.restrictedTraverse('@@batch_triggertransition')())
+        self.assertEqual(res[failing.UID()]['status'], 'error')
+        self.assertTrue('Transition subscriber failed.' in res[failing.UID()]['message'])
+        self.assertEqual(api.content.get_state(failing), 'private')
+        self.assertEqual(res[doc1.UID()]['status'], 'ok')
+        self.assertEqual(res[doc2.UID()]['status'], 'ok')
+        self.assertEqual(api.content.get_state(doc2), 'published')
+
+    def test_batch_trigger_transition_single_uid(self):
+        """A single uid may be given as a string."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        self.request.form.update({'uids': doc.UID(), 'transition': 'publish'})
+        res = json.loads(self.portal.restrictedTraverse('@@batch_triggertransition')())
+        self.assertEqual(res.keys(), [doc.UID()])
+        self.assertEqual(api.content.get_state(doc), 'published')
+
+
+class TestQueuedTransitions(FunctionalTestCase):
+
+    def setUp(self):
+        super(TestQueuedTransitions, self).setUp()
+        api.portal.set_registry_record(QUEUED_TRANSITIONS_RECORD, ['Document.publish'])
+        self.doc = api.content.create(container=self.folder, type='Document', id='doc')
+        transaction.commit()
+
+    def _queue(self, transition):
+        """Queue p_transition on self.doc like actionspanel.js does."""
+        self.request.environ['HTTP_X_REQUESTED_WITH'] = 'XMLHttpRequest'
+        self.request.form.update({'transition': transition, 'comment': u'Queued', 'form.submitted': '1'})
+        return json.loads(self.doc.restrictedTraverse('@@triggertransition')())
+
+    def _status(self, job_id):
+        """Status of p_job_id as polled by actionspanel.js, every poll is a new request."""
+        self.request.form['job_id'] = job_id
+        # HTTPRequest.get caches form values in request.other
+        self.request.other.pop('job_id', None)
+        return json.loads(self.portal.restrictedTraverse('@@queued_transition_status')())
+
+    def test_queue_and_process(self):
+        """The transition is queued then triggered by @@process_queued_transitions."""
+        res = self._queue('publish')
+        self.assertEqual(res['status'], 'queued')
+        self.assertEqual(res['uid'], self.doc.UID())
+        job_id = res['job_id']
+        self.assertTrue(job_id)
+        self.assertEqual(api.content.get_state(self.doc), 'private')
+        status = self._status(job_id)
+        self.assertEqual(status['status'], 'queued')
+        self.assertEqual(status['uid'], self.doc.UID())
+        transaction.commit()
+        self.assertEqual(self.portal.restrictedTraverse('@@process_queued_transitions')(),
+                         'Processed 1 queued transition(s).')
+        self.assertEqual(api.content.get_state(self.doc), 'published')
+        self.assertEqual(self.wfTool.getInfoFor(self.doc, 'comments'), u'Queued')
+        self.assertEqual(self._status(job_id)['status'], 'done')
+        # nothing left to process
+        self.assertEqual(self.portal.restrictedTraverse('@@process_queued_transitions')(),
+                         'Processed 0 queued transition(s).')
+
+    def test_queue_unavailable_transition(self):
+        """A transition that may not be triggered is not queued."""
+        self.wfTool.doActionFor(self.doc, 'publish')
+        res = self._queue('publish')
+        self.assertEqual(res['status'], 'error')
+        self.assertEqual(res['job_id'], None)
+        self.assertTrue(res['message'])
+
+    def test_process_error(self):
+        """A job that fails is marked as error and does not prevent other jobs to be processed."""
+        doc2 = api.content.create(container=self.folder, type='Document', id='doc2')
+        job_id = self._queue('publish')['job_id']
+        self._clearRequestCaches()
+        self.request.form['transition'] = 'publish'
+        job_id2 = json.loads(doc2.restrictedTraverse('@@triggertransition')())['job_id']
+        # doc is published before the job is processed
+        self.wfTool.doActionFor(self.doc, 'publish')
+        transaction.commit()
+        self.assertEqual(self.portal.restrictedTraverse('@@process_queued_transitions')(),
+                         'Processed 2 queued transition(s).')
+        status = self._status(job_id)
+        self.assertEqual(status['status'], 'error')
+        self.assertTrue(status['message'])
+        self.assertEqual(self._status(job_id2)['status'], 'done')
+        self.assertEqual(api.content.get_state(doc2), 'published')
+
+    def test_batch_queue(self):
+        """@@batch_triggertransition queues the transition for every element."""
+        doc2 = api.content.create(container=self.folder, type='Document', id='doc2')
+        published = api.content.create(container=self.folder, type='Document', id='published')
+        self.wfTool.doActionFor(published, 'publish')
+        self.request.form.update({'uids': [self.doc.UID(), doc2.UID(), published.UID()],
+                                  'transition': 'publish'})
+        res = json.loads(self.portal.restrictedTraverse('@@batch_triggertransition')())
+        self.assertEqual(res[self.doc.UID()]['status'], 'queued')
+        self.assertEqual(res[doc2.UID()]['status'], 'queued')
+        self.assertEqual(res[published.UID()]['status'], 'error')
+        self.assertEqual(api.content.get_state(self.doc), 'private')
+        self.assertEqual(self._status(res[doc2.UID()]['job_id'])['status'], 'queued')
+        transaction.commit()
+        self.assertEqual(self.portal.restrictedTraverse('@@process_queued_transitions')(),
+                         'Processed 2 queued transition(s).')
+        self.assertEqual(api.content.get_state(self.doc), 'published')
+        self.assertEqual(api.content.get_state(doc2), 'published')
+
+    def test_status_of_another_user(self):
+        """Only the user that queued the transition may get its status."""
+        job_id = self._queue('publish')['job_id']
+        api.user.create(email='member@example.com', username='member', password='secret123')
+        login(self.portal, 'member')
+        status = self._status(job_id)
+        self.assertEqual(status['status'], 'unknown')
+        self.assertEqual(status['uid'], None)
+        self.assertEqual(self._status('unknown_job')['status'], 'unknown')
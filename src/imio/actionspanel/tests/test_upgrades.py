@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+from zope.component import getUtility
+
+from plone import api
+from plone.registry.interfaces import IRegistry
+
+from imio.actionspanel.tests.base import IntegrationTestCase
+
+PROFILE_ID = 'imio.actionspanel:default'
+QUEUED_TRANSITIONS_RECORD = 'imio.actionspanel.browser.registry.IImioActionsPanelConfig.queued_transitions'
+
+
+class TestUpgrades(IntegrationTestCase):
+
+    def _runUpgrades(self):
+        """Run the upgrade steps proposed for the profile, steps of an upgradeSteps are grouped."""
+        setup = api.portal.get_tool('portal_setup')
+        for upgrade in setup.listUpgrades(PROFILE_ID):
+            if not isinstance(upgrade, list):
+                upgrade = [upgrade]
+            for info in upgrade:
+                info['step'].doStep(setup)
+
+    def test_upgrade_to_1_21(self):
+        """Sites installed before 1.21 get the 'queued_transitions' registry record."""
+        setup = api.portal.get_tool('portal_setup')
+        registry = getUtility(IRegistry)
+        del registry.records[QUEUED_TRANSITIONS_RECORD]
+        setup.setLastVersionForProfile(PROFILE_ID, '1.20.dev0')
+        self.assertTrue(setup.listUpgrades(PROFILE_ID))
+        self._runUpgrades()
+        self.assertTrue(QUEUED_TRANSITIONS_RECORD in registry.records)
+        self.assertEqual(registry[QUEUED_TRANSITIONS_RECORD], None)
+        # nothing to upgrade once at the profile version
+        setup.setLastVersionForProfile(PROFILE_ID, '1.21')
+        self.assertFalse(setup.listUpgrades(PROFILE_ID))
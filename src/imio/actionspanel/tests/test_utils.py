@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+from OFS.ObjectManager import BeforeDeleteException
+
+from plone import api
+from plone.app.testing import login
+
+from imio.actionspanel.tests.base import RemovalTestCase
+from imio.actionspanel.utils import unrestrictedRemoveGivenObjects
+
+
+class TestUnrestrictedRemoveGivenObjects(RemovalTestCase):
+
+    def test_remove_by_parent(self):
+        """Elements of several parents are removed, even if the user may not delete them."""
+        other = api.content.create(container=self.portal, type='Folder', id='other')
+        doc1 = api.content.create(container=self.folder, type='Document', id='doc1')
+        doc2 = api.content.create(container=self.folder, type='Document', id='doc2')
+        doc3 = api.content.create(container=other, type='Document', id='doc3')
+        api.user.create(email='member@example.com', username='member', password='secret123')
+        login(self.portal, 'member')
+        self.assertEqual(unrestrictedRemoveGivenObjects([doc1, doc3, doc2]), [])
+        self.assertEqual(self.folder.objectIds(), [])
+        self.assertEqual(other.objectIds(), [])
+
+    def test_before_delete_exception(self):
+        """Only the element raising a BeforeDeleteException is not removed."""
+        doc1 = api.content.create(container=self.folder, type='Document', id='doc1')
+        protected = api.content.create(container=self.folder, type='Document', id='protected')
+        doc2 = api.content.create(container=self.folder, type='Document', id='doc2')
+        failed = unrestrictedRemoveGivenObjects([doc1, protected, doc2])
+        self.assertEqual([obj.getId() for obj, exc in failed], ['protected'])
+        self.assertTrue(isinstance(failed[0][1], BeforeDeleteException))
+        self.assertEqual(self.folder.objectIds(), ['protected'])
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+
+import transaction
+from App.config import getConfiguration
+from Products.ATContentTypes.interfaces import IATDocument
+from Products.CMFCore.Expression import Expression
+from Products.Five.browser.metaconfigure import makeClassForTemplate
+from zope.component import getGlobalSiteManager
+from zope.interface import Interface
+from ZPublisher.pubevents import PubSuccess
+
+from plone import api
+from plone.app.testing import login
+from plone.memoize import ram
+
+from imio.actionspanel import browser
+from imio.actionspanel import stats
+from imio.actionspanel.browser.views import _history_last_event_has_comments_cachekey
+from imio.actionspanel.browser.views import _translation_table_cachekey
+from imio.actionspanel.browser.views import ActionsPanelView
+from imio.actionspanel.browser.views import panelCacheStatistics
+from imio.actionspanel.browser.views import PANEL_CACHE
+from imio.actionspanel.browser.views import translateForLanguage
+from imio.actionspanel.interfaces import IActionsPanelLayer
+from imio.actionspanel.tests.base import FunctionalTestCase
+from imio.actionspanel.tests.base import IntegrationTestCase
+from imio.actionspanel.tests.base import RemovalTestCase
+
+
+class TestActionsPanelView(IntegrationTestCase):
+
+    def test_listObjectButtonsActions_type_actions(self):
+        """object_buttons actions defined on the FTI (portal_types provider) are listed."""
+        fti = api.portal.get_tool('portal_types')['Document']
+        fti.addAction(id='my_type_button',
+                      name='My type button',
+                      action='string:${object_url}/my_type_button',
+                      condition='',
+                      permission=('View', ),
+                      category='object_buttons',
+                      visible=True)
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        view = doc.restrictedTraverse('@@actions_panel')
+        action_ids = [action['id'] for action in view.listObjectButtonsActions()]
+        self.assertTrue('my_type_button' in action_ids)
+        # actions are listed in the order of the action providers
+        providers = api.portal.get_tool('portal_actions').listActionProviders()
+        self.assertEqual(action_ids.index('my_type_button') < action_ids.index('copy'),
+                         providers.index('portal_types') < providers.index('portal_actions'))
+        # actions of other categories are not listed
+        self.assertFalse('view' in action_ids)
+        # IGNORABLE_ACTIONS also applies to actions of other providers
+        self._clearRequestCaches()
+        view = doc.restrictedTraverse('@@actions_panel')
+        view.IGNORABLE_ACTIONS = ('my_type_button', )
+        action_ids = [action['id'] for action in view.listObjectButtonsActions()]
+        self.assertFalse('my_type_button' in action_ids)
+        # IGNORABLE_PROVIDERS
+        view = doc.restrictedTraverse('@@actions_panel')
+        view.IGNORABLE_PROVIDERS = ('portal_workflow', 'portal_types')
+        action_ids = [action['id'] for action in view.listObjectButtonsActions()]
+        self.assertFalse('my_type_button' in action_ids)
+        # not listed for another portal_type
+        news = api.content.create(container=self.folder, type='News Item', id='news')
+        view = news.restrictedTraverse('@@actions_panel')
+        action_ids = [action['id'] for action in view.listObjectButtonsActions()]
+        self.assertFalse('my_type_button' in action_ids)
+
+    def test_lazy_placeholder(self):
+        """The placeholder keeps the URL to return to and the faceted flag."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        view = doc.restrictedTraverse('@@actions_panel')
+        placeholder = view(lazy=True, showArrows=True)
+        self.assertTrue('class="actionspanel-lazy"' in placeholder)
+        self.assertTrue('data-return-to="{0}"'.format(self.request.getURL()) in placeholder)
+        self.assertTrue('data-faceted="0"' in placeholder)
+        # when options are not JSON serializable, the full panel is rendered
+        view = doc.restrictedTraverse('@@actions_panel')
+        panel = view(lazy=True, notSerializable=object())
+        self.assertFalse('actionspanel-lazy' in panel)
+        self.assertTrue('actionspanel-no-style-table' in panel)
+
+    def test_return_to_and_faceted_from_request(self):
+        """Panels rendered by another request use the URL and faceted flag given in the request."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        view = doc.restrictedTraverse('@@actions_panel')
+        self.assertEqual(view._returnTo(), self.request.getURL())
+        self.assertFalse(view.isInFacetedNavigation())
+        return_to = self.folder.absolute_url() + '/listing'
+        self.request.form['actionspanel_return_to'] = return_to
+        self.request.form['actionspanel_faceted'] = '1'
+        self.assertEqual(view._returnTo(), return_to)
+        self.assertTrue(view.isInFacetedNavigation())
+        # only URLs of the portal are accepted
+        self.request.form['actionspanel_return_to'] = 'http://www.example.com/evil'
+        self.assertEqual(view._returnTo(), self.request.getURL())
+
+    def test_history_last_event_has_comments_cachekey(self):
+        """The cache key depends on the workflow_history and on the member."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        view = doc.restrictedTraverse('@@actions_panel')
+        key = _history_last_event_has_comments_cachekey(None, view)
+        self.assertEqual(key, _history_last_event_has_comments_cachekey(None, view))
+        self.wfTool.doActionFor(doc, 'publish')
+        published_key = _history_last_event_has_comments_cachekey(None, view)
+        self.assertNotEqual(key, published_key)
+        # another member
+        api.user.create(email='reader@example.com', username='reader', password='secret123', roles=('Reader', ))
+        login(self.portal, 'reader')
+        self._clearRequestCaches()
+        view = doc.restrictedTraverse('@@actions_panel')
+        self.assertNotEqual(published_key, _history_last_event_has_comments_cachekey(None, view))
+
+
+class TestTransitionDescriptors(FunctionalTestCase):
+
+    def _transitionTitles(self, obj):
+        """Titles of the transitions displayed for p_obj, by transition id."""
+        self._clearRequestCaches()
+        view = obj.restrictedTraverse('@@actions_panel')
+        return dict([(transition['id'], transition['title']) for transition in view.getTransitions()])
+
+    def test_invalidated_when_workflow_changes(self):
+        """Cached transition descriptors are computed again when the workflow definition is changed."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        transaction.commit()
+        self.assertEqual(sorted(self._transitionTitles(doc)), ['publish', 'submit'])
+        workflow = self.wfTool.getWorkflowsFor(doc)[0]
+        # a transition is changed
+        workflow.transitions['publish'].title = 'Publish the document'
+        transaction.commit()
+        self.assertEqual(self._transitionTitles(doc)['publish'], u'Publish the document')
+        # a state is changed
+        workflow.states['private'].transitions = ('submit', )
+        transaction.commit()
+        self.assertEqual(self._transitionTitles(doc).keys(), ['submit'])
+
+
+class TestContextIndependentGuardExpressions(IntegrationTestCase):
+
+    # only true for 'doc1' so it shows if the result computed for 'doc1' is reused
+    GUARD_EXPR = "python: here.getId() == 'doc1'"
+
+    def setUp(self):
+        super(TestContextIndependentGuardExpressions, self).setUp()
+        os.environ['IMIO_ACTIONSPANEL_STATS'] = '1'
+        self.addCleanup(os.environ.pop, 'IMIO_ACTIONSPANEL_STATS')
+        workflow = self.wfTool.getWorkflowById('simple_publication_workflow')
+        workflow.transitions['publish'].guard.expr = Expression(self.GUARD_EXPR)
+        self.docs = [api.content.create(container=self.folder, type='Document', id=doc_id)
+                     for doc_id in ('doc1', 'doc2', 'doc3')]
+        self.wfTool.doActionFor(self.docs[2], 'submit')
+        self._clearRequestCaches()
+
+    def _mayPublish(self, contextIndependent):
+        """Render the transitions of every doc in the same request like a listing does."""
+        res = []
+        for doc in self.docs:
+            view = doc.restrictedTraverse('@@actions_panel')
+            if contextIndependent:
+                view.CONTEXT_INDEPENDENT_GUARD_EXPRESSIONS = (self.GUARD_EXPR, )
+            res.append('publish' in [transition['id'] for transition in view.getTransitions()])
+        return res
+
+    def test_evaluated_by_element(self):
+        """By default, the guard expression is evaluated for every element."""
+        self.assertEqual(self._mayPublish(False), [True, False, False])
+        self.assertFalse('guard_expression_cache_hits' in stats.getRequestStats(self.request)['counters'])
+
+    def test_evaluated_once_by_state(self):
+        """A context independent guard expression is evaluated once by state and reused by every rows."""
+        # doc2 is in the same state as doc1 and reuses its result, doc3 is pending
+        self.assertEqual(self._mayPublish(True), [True, True, False])
+        self.assertEqual(stats.getRequestStats(self.request)['counters']['guard_expression_cache_hits'], 1)
+
+
+class TestTranslateForLanguage(IntegrationTestCase):
+
+    def setUp(self):
+        super(TestTranslateForLanguage, self).setUp()
+        config = getConfiguration()
+        self.addCleanup(setattr, config, 'debug_mode', config.debug_mode)
+
+    def test_cached(self):
+        """Translations are cached by msgid, domain, language, default and mapping."""
+        getConfiguration().debug_mode = False
+        self.assertEqual(_translation_table_cachekey(translateForLanguage, u'Publish', 'plone', 'fr', None, None),
+                         (u'Publish', 'plone', 'fr', None, None))
+        self.assertEqual(_translation_table_cachekey(translateForLanguage, u'Hello ${name}', 'plone', 'fr',
+                                                     None, {'name': u'John'}),
+                         (u'Hello ${name}', 'plone', 'fr', None, [('name', u'John')]))
+
+    def test_bypassed_in_debug_mode(self):
+        """In debug mode, translation catalogs are reloaded when changed so nothing is cached."""
+        getConfiguration().debug_mode = True
+        self.assertRaises(ram.DontCache,
+                          _translation_table_cachekey, translateForLanguage, u'Publish', 'plone', 'fr', None, None)
+        self.assertEqual(translateForLanguage(u'Unknown msgid', 'plone', 'fr', u'Default', None), u'Default')
+
+
+class TestActionsPanelBatchView(IntegrationTestCase):
+
+    def test_view_registered_for_elements_only(self):
+        """An actions panel view that is not available on the portal is looked up on the elements."""
+        view_class = makeClassForTemplate(os.path.join(os.path.dirname(browser.__file__), 'actions_panel.pt'),
+                                          bases=(ActionsPanelView, ),
+                                          name='document_actions_panel')
+        gsm = getGlobalSiteManager()
+        gsm.registerAdapter(view_class, (IATDocument, IActionsPanelLayer), Interface, 'document_actions_panel')
+        self.addCleanup(gsm.unregisterAdapter, view_class, (IATDocument, IActionsPanelLayer), Interface,
+                        'document_actions_panel')
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        self.request.form.update({'uids': [doc.UID()],
+                                  'actionspanel_view_name': 'document_actions_panel',
+                                  'options': '{"useIcons": false}'})
+        res = json.loads(self.portal.restrictedTraverse('@@actions_panel_batch')())
+        self.assertEqual(res.keys(), [doc.UID()])
+        self.assertTrue('data-viewname="document_actions_panel"' in res[doc.UID()])
+
+
+class TestActionsPanelJSONView(IntegrationTestCase):
+
+    def _json(self, obj):
+        self._clearRequestCaches()
+        return obj.restrictedTraverse('@@actions_panel_json')()
+
+    def test_etag(self):
+        """An ETag is computed from the data, a 304 is returned if it matches If-None-Match."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        response = self.request.response
+        body = self._json(doc)
+        self.assertEqual(json.loads(body).keys(), [doc.UID()])
+        etag = response.getHeader('ETag')
+        self.assertTrue(etag)
+        self.request.environ['HTTP_IF_NONE_MATCH'] = etag
+        self.assertEqual(self._json(doc), '')
+        self.assertEqual(response.getStatus(), 304)
+        # the ETag changes with the data
+        self.wfTool.doActionFor(doc, 'publish')
+        response.setStatus(200)
+        body = self._json(doc)
+        self.assertEqual(response.getStatus(), 200)
+        self.assertTrue(json.loads(body)[doc.UID()])
+        self.assertNotEqual(response.getHeader('ETag'), etag)
+
+
+class TestStats(IntegrationTestCase):
+
+    def setUp(self):
+        super(TestStats, self).setUp()
+        os.environ['IMIO_ACTIONSPANEL_STATS'] = '1'
+        self.addCleanup(os.environ.pop, 'IMIO_ACTIONSPANEL_STATS')
+        stats.resetProcessStats()
+        self.addCleanup(stats.resetProcessStats)
+
+    def test_disabled(self):
+        """Nothing is collected if instrumentation is not enabled."""
+        del os.environ['IMIO_ACTIONSPANEL_STATS']
+        self.addCleanup(os.environ.setdefault, 'IMIO_ACTIONSPANEL_STATS', '1')
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        doc.restrictedTraverse('@@actions_panel')()
+        self.assertEqual(self.request.get(stats.REQUEST_STATS_KEY, None), None)
+        stats.onRequestEnd(PubSuccess(self.request))
+        self.assertEqual(stats.processStats()['requests'], 0)
+
+    def test_request_and_process_stats(self):
+        """Sections and counters are collected on the request then added to the process statistics."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        doc.restrictedTraverse('@@actions_panel')()
+        request_stats = self.request.get(stats.REQUEST_STATS_KEY)
+        sections = doc.restrictedTraverse('@@actions_panel').SECTIONS_TO_RENDER
+        self.assertEqual(sorted(request_stats['sections']), sorted(sections))
+        self.assertEqual(request_stats['sections']['renderTransitions']['Document']['private']['count'], 1)
+        self.assertTrue(request_stats['counters']['guard_evaluations'])
+        summary = stats.summary(request_stats)
+        self.assertTrue('renderTransitions Document private: 1 renders in ' in summary)
+        self.assertTrue('guard_evaluations: ' in summary)
+        # the IPubEnd subscriber adds request statistics to the process statistics
+        stats.onRequestEnd(PubSuccess(self.request))
+        stats.onRequestEnd(PubSuccess(self.request))
+        process_stats = stats.processStats()
+        self.assertEqual(process_stats['requests'], 2)
+        self.assertEqual(process_stats['sections']['renderTransitions']['Document']['private']['count'], 2)
+        self.assertEqual(process_stats['counters']['guard_evaluations'],
+                         request_stats['counters']['guard_evaluations'] * 2)
+
+    def test_stats_view(self):
+        """@@actions_panel_stats returns the process statistics and resets them if reset=1."""
+        doc = api.content.create(container=self.folder, type='Document', id='doc')
+        doc.restrictedTraverse('@@actions_panel')()
+        stats.onRequestEnd(PubSuccess(self.request))
+        res = json.loads(self.portal.restrictedTraverse('@@actions_panel_stats')())
+        self.assertTrue(res['enabled'])
+        self.assertEqual(res['requests'], 1)
+        self.assertTrue(res['counters']['guard_evaluations'])
+        self.assertEqual(res['conflict_retries'], {})
+        self.request.form['reset'] = '1'
+        res = json.loads(self.portal.restrictedTraverse('@@actions_panel_stats')())
+        # statistics are returned then reset
+        self.assertEqual(res['requests'], 1)
+        self.assertEqual(stats.processStats()['requests'], 0)
+        self.assertEqual(stats.processStats()['sections'], {})
+
+
+class TestPanelCache(IntegrationTestCase):
+
+    def setUp(self):
+        super(TestPanelCache, self).setUp()
+        PANEL_CACHE.invalidateAll()
+        self.addCleanup(PANEL_CACHE.invalidateAll)
+        self.doc = api.content.create(container=self.folder, type='Document', id='doc')
+
+    def _render(self, **options):
+        """Render the panel of self.doc using the cache, like a new request would."""
+        self._clearRequestCaches()
+        view = self.doc.restrictedTraverse('@@actions_panel')
+        view.CACHE_RENDERED_PANEL = True
+        return view(**options)
+
+    def _assertStatistics(self, hits, misses):
+        statistics = panelCacheStatistics()
+        self.assertEqual((statistics['hits'], statistics['misses']), (hits, misses))
+
+    def test_hit_and_miss(self):
+        """The panel is rendered once then taken from the cache."""
+        rendered = self._render(showHistory=True)
+        self._assertStatistics(0, 1)
+        self.assertEqual(self._render(showHistory=True), rendered)
+        self._assertStatistics(1, 1)
+        # other options
+        self._render()
+        self._assertStatistics(1, 2)
+        # panels showing arrows are not cached
+        self._render(showArrows=True)
+        self._render(showArrows=True)
+        self._assertStatistics(1, 2)
+
+    def test_invalidated_when_review_state_changes(self):
+        """The panel is rendered again when the element review_state changed."""
+        rendered = self._render()
+        self.wfTool.doActionFor(self.doc, 'publish')
+        self.assertNotEqual(self._render(), rendered)
+        self._assertStatistics(0, 2)
+        self._render()
+        self._assertStatistics(1, 2)
+
+    def test_page_and_faceted(self):
+        """A panel cached for a page is not used in another page or in a faceted."""
+        self._render()
+        self.request.form['actionspanel_return_to'] = self.folder.absolute_url() + '/listing'
+        rendered = self._render()
+        self._assertStatistics(0, 2)
+        self.assertTrue('data-return-to="{0}/listing"'.format(self.folder.absolute_url()) in rendered)
+        self.request.form['actionspanel_faceted'] = '1'
+        self.assertTrue('data-faceted="1"' in self._render())
+        self._assertStatistics(0, 3)
+
+    def test_member_isolation(self):
+        """Members with same roles and groups do not share cached panels."""
+        self._render(showHistory=True)
+        api.user.create(email='manager@example.com', username='manager', password='secret123',
+                        roles=('Manager', ))
+        login(self.portal, 'manager')
+        self._render(showHistory=True)
+        self._assertStatistics(0, 2)
+        self._render(showHistory=True)
+        self._assertStatistics(1, 2)
+
+
+class TestDeleteGivenUidsView(RemovalTestCase):
+
+    def test_delete_given_uids(self):
+        """Every element is deleted but elements that raise a BeforeDeleteException or that are not found."""
+        doc1 = api.content.create(container=self.folder, type='Document', id='doc1')
+        doc2 = api.content.create(container=self.portal, type='Document', id='doc2')
+        protected = api.content.create(container=self.folder, type='Document', id='protected')
+        uids = [doc1.UID(), doc2.UID(), protected.UID(), 'unknown_uid']
+        res = json.loads(self.portal.restrictedTraverse('@@delete_givenuids')(uids))
+        self.assertEqual(res[doc1.UID()]['status'], 'deleted')
+        self.assertEqual(res[doc2.UID()]['status'], 'deleted')
+        self.assertEqual(res[protected.UID()]['status'], 'error')
+        self.assertEqual(res[protected.UID()]['message'], u'This element may not be removed.')
+        self.assertEqual(res['unknown_uid']['status'], 'not_found')
+        self.assertEqual(self.folder.objectIds(), ['protected'])
+        self.assertFalse('doc2' in self.portal.objectIds())
+
+    def test_delete_given_uids_unauthorized(self):
+        """Elements the user may not delete are not removed, other elements are."""
+        doc1 = api.content.create(container=self.folder, type='Document', id='doc1')
+        doc2 = api.content.create(container=self.folder, type='Document', id='doc2')
+        self.wfTool.doActionFor(doc2, 'publish')
+        api.user.create(email='member@example.com', username='member', password='secret123')
+        api.user.grant_roles(username='member', obj=doc1, roles=['Owner'])
+        doc1.reindexObjectSecurity()
+        login(self.portal, 'member')
+        # string given by a single uids:list
+        res = json.loads(self.portal.restrictedTraverse('@@delete_givenuids')(doc2.UID()))
+        self.assertEqual(res, {doc2.UID(): {'status': 'unauthorized', 'message': ''}})
+        res = json.loads(self.portal.restrictedTraverse('@@delete_givenuids')([doc1.UID(), doc2.UID()]))
+        self.assertEqual(res[doc1.UID()]['status'], 'deleted')
+        self.assertEqual(res[doc2.UID()]['status'], 'unauthorized')
+        self.assertEqual(self.folder.objectIds(), ['doc2'])
+
+
+class TestFolderPositionTypeAwareView(IntegrationTestCase):
+
+    def setUp(self):
+        super(TestFolderPositionTypeAwareView, self).setUp()
+        # documents and news items alternate
+        for obj_id, portal_type in (('doc1', 'Document'), ('news1', 'News Item'),
+                                    ('doc2', 'Document'), ('news2', 'News Item'),
+                                    ('doc3', 'Document')):
+            api.content.create(container=self.folder, type=portal_type, id=obj_id)
+        self.reindexed = []
+
+    def _move(self, position, obj_id):
+        """Move p_obj_id and keep ids of elements which position was reindexed."""
+        view = self.folder.restrictedTraverse('@@folder_position_typeaware')
+        reindexPositions = view._reindexPositions
+
+        def _reindexPositions(ids):
+            self.reindexed.append(list(ids))
+            reindexPositions(ids)
+        view._reindexPositions = _reindexPositions
+        view(position=position, id=obj_id)
+
+    def _catalogOrder(self):
+        """Ids of the elements of the folder sorted by position in the catalog."""
+        catalog = api.portal.get_tool('portal_catalog')
+        brains = catalog(path={'query': '/'.join(self.folder.getPhysicalPath()), 'depth': 1},
+                         sort_on='getObjPositionInParent')
+        return [brain.getId for brain in brains]
+
+    def test_move_up_and_down(self):
+        """The element takes the place of the previous/next element of same portal_type."""
+        self._move('up', 'doc3')
+        self.assertEqual(self.folder.objectIds(), ['doc1', 'news1', 'doc3', 'doc2', 'news2'])
+        # only elements between the old and new positions are reindexed
+        self.assertEqual(self.reindexed, [['doc2', 'news2', 'doc3']])
+        self.assertEqual(self._catalogOrder(), self.folder.objectIds())
+        self._move('down', 'news1')
+        self.assertEqual(self.folder.objectIds(), ['doc1', 'doc3', 'doc2', 'news2', 'news1'])
+        self.assertEqual(self.reindexed[-1], ['news1', 'doc3', 'doc2', 'news2'])
+        self.assertEqual(self._catalogOrder(), self.folder.objectIds())
+
+    def test_move_without_neighbour(self):
+        """Nothing moves when there is no previous/next element of same portal_type."""
+        self._move('up', 'doc1')
+        self._move('down', 'news2')
+        self.assertEqual(self.folder.objectIds(), ['doc1', 'news1', 'doc2', 'news2', 'doc3'])
+        self.assertEqual(self.reindexed, [['doc1'], ['news2']])
+
+    def test_move_top_and_bottom(self):
+        """Positions from the top or to the bottom are reindexed."""
+        self._move('top', 'doc2')
+        self.assertEqual(self.folder.objectIds(), ['doc2', 'doc1', 'news1', 'news2', 'doc3'])
+        self.assertEqual(self.reindexed, [['doc1', 'news1', 'doc2']])
+        self._move('bottom', 'doc1')
+        self.assertEqual(self.folder.objectIds(), ['doc2', 'news1', 'news2', 'doc3', 'doc1'])
+        self.assertEqual(self.reindexed[-1], ['doc1', 'news1', 'news2', 'doc3'])
+        self.assertEqual(self._catalogOrder(), self.folder.objectIds())
+
+    def test_redirect(self):
+        """The user is redirected to given template_id but never outside the portal."""
+        view = self.folder.restrictedTraverse('@@folder_position_typeaware')
+        view(position='top', id='doc2', template_id='view')
+        self.assertEqual(self.request.response.getHeader('location'), self.folder.absolute_url() + '/view')
+        listing = self.portal.absolute_url() + '/listing'
+        view(position='top', id='doc3', template_id=listing)
+        self.assertEqual(self.request.response.getHeader('location'), listing)
+        for template_id in ('http://www.example.com/phishing', self.portal.absolute_url() + '.example.com/'):
+            view(position='top', id='doc1', template_id=template_id)
+            self.assertEqual(self.request.response.getHeader('location'),
+                             self.folder.absolute_url() + '/folder_contents')
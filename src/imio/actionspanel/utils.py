@@ -1,6 +1,12 @@
 import logging
 logger = logging.getLogger('imio.actionspanel')
 
+from collections import OrderedDict
+
+import transaction
+
+from OFS.ObjectManager import BeforeDeleteException
+
 from plone import api
 
 
@@ -23,3 +29,45 @@ def unrestrictedRemoveGivenObject(object_to_delete):
     with api.env.adopt_roles(['Manager']):
         parent.manage_delObjects(object_to_delete.getId())
         logger.info(logMsg)
+
+
+def unrestrictedRemoveGivenObjects(objects_to_delete):
+    """
+      Remove several objects as a Manager like unrestrictedRemoveGivenObject does.
+      Objects are grouped by parent so manage_delObjects is called once for every parent.
+      If removing objects of a parent raises a BeforeDeleteException, these objects are
+      removed one by one so only the object raising the exception is not removed.
+      This is called by the 'delete_givenuids' view that does the checks if user
+      may delete every p_objects_to_delete.
+      Returns a list of (object, exception) for objects that could not be removed.
+    """
+    userId = api.user.get_current().getId()
+    parents = OrderedDict()
+    for obj in objects_to_delete:
+        parent = obj.aq_inner.aq_parent
+        parents.setdefault('/'.join(parent.getPhysicalPath()), (parent, []))[1].append(obj)
+
+    failed = []
+    with api.env.adopt_roles(['Manager']):
+        for parent, objs in parents.values():
+            logMsgs = ['{} at {} deleted by "{}"'.format(obj.meta_type, obj.absolute_url_path(), userId)
+                       for obj in objs]
+            savepoint = transaction.savepoint(optimistic=True)
+            try:
+                parent.manage_delObjects([obj.getId() for obj in objs])
+            except BeforeDeleteException:
+                savepoint.rollback()
+                logMsgs = []
+                for obj in objs:
+                    logMsg = '{} at {} deleted by "{}"'.format(obj.meta_type, obj.absolute_url_path(), userId)
+                    savepoint = transaction.savepoint(optimistic=True)
+                    try:
+                        parent.manage_delObjects(obj.getId())
+                    except BeforeDeleteException, exc:
+                        savepoint.rollback()
+                        failed.append((obj, exc))
+                    else:
+                        logMsgs.append(logMsg)
+            for logMsg in logMsgs:
+                logger.info(logMsg)
+    return failed